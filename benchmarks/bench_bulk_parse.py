@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+批量解析基准测试: 对比单进程与不同大小进程池下 WechatBasic.parse_messages 的吞吐量
+
+运行方式 (项目根目录下): PYTHONPATH=. python benchmarks/bench_bulk_parse.py [消息数]
+"""
+from __future__ import print_function
+
+import multiprocessing
+import sys
+import time
+
+from samples import SAMPLES
+from wechat_sdk import WechatBasic
+
+
+def main(number=200000):
+    payloads = [SAMPLES[i % len(SAMPLES)][1] for i in range(number)]
+    wechat = WechatBasic()
+
+    print('%-12s %12s %14s' % ('processes', 'seconds', 'messages/s'))
+    for processes in [None] + list(range(2, multiprocessing.cpu_count() + 1, 2)):
+        start = time.time()
+        count = sum(1 for _ in wechat.parse_messages(payloads, processes=processes, chunksize=1024))
+        elapsed = time.time() - start
+        assert count == number
+        print('%-12s %12.2f %14.0f' % (processes or 1, elapsed, number / elapsed))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
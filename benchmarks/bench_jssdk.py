@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+JS-SDK 签名基准测试: 对比每次调用 generate_jsapi_signature() 与 JsapiConfig 缓存签名后生成 wx.config 配置的耗时
+
+运行方式 (项目根目录下): PYTHONPATH=. python benchmarks/bench_jssdk.py [次数] [页面数]
+"""
+from __future__ import print_function
+
+import itertools
+import sys
+import time
+import timeit
+
+from wechat_sdk import WechatBasic
+from wechat_sdk.jssdk import JsapiConfig, generate_noncestr
+
+
+def main(number=100000, pages=1000):
+    wechat = WechatBasic(appid='appid', appsecret='appsecret', jsapi_ticket='TICKET' * 10,
+                         jsapi_ticket_expires_at=int(time.time()) + 7200)
+    config = JsapiConfig(wechat, js_api_list=['chooseImage', 'previewImage'])
+    urls = ['http://example.com/page/{}?from=timeline'.format(i) for i in range(pages)]
+
+    def legacy(urls=itertools.cycle(urls)):
+        timestamp, noncestr = int(time.time()), generate_noncestr()
+        return wechat.generate_jsapi_signature(timestamp, noncestr, next(urls))
+
+    def cached(urls=itertools.cycle(urls)):
+        return config.get_config(next(urls))
+
+    legacy_time = min(timeit.repeat(legacy, number=number, repeat=5))
+    cached_time = min(timeit.repeat(cached, number=number, repeat=5))
+    batch_time = min(timeit.repeat(lambda: config.get_configs(urls), number=max(number // pages, 1), repeat=5))
+
+    print('%-36s %10.2f us/call' % ('generate_jsapi_signature', legacy_time / number * 1e6))
+    print('%-36s %10.2f us/call' % ('JsapiConfig.get_config (cached)', cached_time / number * 1e6))
+    print('%-36s %10.2f us/page' % ('JsapiConfig.get_configs (%d pages)' % pages,
+                                    batch_time / (max(number // pages, 1) * pages) * 1e6))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+消息类内存占用基准测试: 对比 WechatMessage (__dict__) 与 CompactWechatMessage (__slots__) 两种布局
+
+运行方式 (项目根目录下): PYTHONPATH=. python benchmarks/bench_message_memory.py [消息数]
+依赖 tracemalloc, 需要 Python 3.4 及以上版本
+"""
+from __future__ import print_function
+
+import sys
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    print('bench_message_memory requires tracemalloc (Python 3.4+), skipped.')
+    sys.exit(0)
+
+from samples import SAMPLES
+from wechat_sdk.decoder import MessageDecoder
+
+
+def measure(decoder, payloads):
+    """
+    返回保存全部消息对象后新增的内存字节数 (不含原始数据本身)
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    messages = [decoder.decode(payload) for payload in payloads]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del messages
+    return after - before
+
+
+def main(number=20000):
+    print('%-30s %14s %14s %8s' % ('message', 'dict (B/msg)', 'slots (B/msg)', 'saving'))
+    for name, body in SAMPLES:
+        # 每条消息持有独立的原始数据, 与实际缓存消息时的情况一致
+        payloads = [bytes(bytearray(body)) for _ in range(number)]
+        dict_size = measure(MessageDecoder(), payloads)
+        slots_size = measure(MessageDecoder(compact=True), payloads)
+        print('%-30s %14.1f %14.1f %7.1f%%' % (
+            name,
+            float(dict_size) / number,
+            float(slots_size) / number,
+            100.0 * (dict_size - slots_size) / dict_size,
+        ))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
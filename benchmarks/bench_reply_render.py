@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+回复渲染基准测试: 对比 render() + UTF-8 编码、预编译模板 render_bytes() 及 ReplyCache 缓存消息体后的耗时及响应体大小
+
+运行方式 (项目根目录下): PYTHONPATH=. python benchmarks/bench_reply_render.py [次数]
+"""
+from __future__ import print_function
+
+import sys
+import timeit
+
+from samples import SAMPLES
+from wechat_sdk.decoder import MessageDecoder
+from wechat_sdk.reply import ReplyCache, TextReply, ImageReply, VoiceReply, VideoReply, MusicReply, Article, ArticleReply
+
+
+def build_replies(message):
+    news = ArticleReply(message)
+    for i in range(10):
+        news.add_article(Article(title=u'标题 %d' % i, description=u'这是一段图文消息的描述',
+                                 picurl='http://example.com/pic/%d.jpg' % i, url='http://example.com/%d' % i))
+    return [
+        ('text', TextReply(message, content=u'你好, 这是一条自动回复')),
+        ('image', ImageReply(message, media_id='media_id')),
+        ('voice', VoiceReply(message, media_id='media_id')),
+        ('video', VideoReply(message, media_id='media_id', title=u'视频', description=u'视频描述')),
+        ('music', MusicReply(message, title=u'音乐', description=u'音乐描述', music_url='http://example.com/a.mp3',
+                             thumb_media_id='thumb_media_id')),
+        ('news (10 articles)', news),
+    ]
+
+
+def main(number=20000):
+    message = MessageDecoder().decode(SAMPLES[0][1])
+
+    cache = ReplyCache()
+
+    print('%-20s %12s %12s %8s %12s %8s %10s %10s' % ('reply', 'render (us)', 'bytes (us)', 'speedup',
+                                                    'cached (us)', 'speedup', 'size', 'new size'))
+    for name, reply in build_replies(message):
+        legacy_time = min(timeit.repeat(lambda: reply.render().encode('utf-8'), number=number, repeat=5))
+        bytes_time = min(timeit.repeat(reply.render_bytes, number=number, repeat=5))
+        cached_time = min(timeit.repeat(lambda: cache.render(reply), number=number, repeat=5))
+        print('%-20s %12.2f %12.2f %7.2fx %12.2f %7.2fx %10d %10d' % (
+            name,
+            legacy_time / number * 1e6,
+            bytes_time / number * 1e6,
+            legacy_time / bytes_time,
+            cached_time / number * 1e6,
+            legacy_time / cached_time,
+            len(reply.render().encode('utf-8')),
+            len(reply.render_bytes()),
+        ))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
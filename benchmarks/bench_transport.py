@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+API 调用基准测试: 使用进程内的 MockWechatServer 测量 SDK 自身的开销, 以及在模拟网络延迟下线程池与 asyncio 的并发吞吐量
+
+运行方式 (项目根目录下): PYTHONPATH=. python benchmarks/bench_transport.py [调用次数] [延迟毫秒数]
+"""
+from __future__ import print_function
+
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+
+from wechat_sdk import WechatBasic
+from wechat_sdk.mock import MockWechatServer
+from wechat_sdk.transport import MockTransport
+
+
+def measure_overhead(number):
+    server = MockWechatServer()
+    wechat = WechatBasic(appid=server.appid, appsecret=server.appsecret, transport=MockTransport(server))
+    access_token = wechat.access_token
+
+    start = time.time()
+    for i in range(number):
+        server.handle('post', 'https://api.weixin.qq.com/cgi-bin/message/custom/send',
+                      params={'access_token': access_token}, data=b'{"touser": "openid"}')
+    server_time = time.time() - start
+
+    start = time.time()
+    for i in range(number):
+        wechat.send_text_message('openid', u'你好')
+    total_time = time.time() - start
+
+    print('%-28s %10.2f us/call' % ('mock server only', server_time / number * 1e6))
+    print('%-28s %10.2f us/call' % ('send_text_message', total_time / number * 1e6))
+    print('%-28s %10.2f us/call' % ('SDK overhead', (total_time - server_time) / number * 1e6))
+
+
+def measure_threads(number, latency, workers):
+    server = MockWechatServer(latency=latency)
+    wechat = WechatBasic(appid=server.appid, appsecret=server.appsecret, transport=MockTransport(server))
+    wechat.access_token
+
+    pool = ThreadPool(workers)
+    start = time.time()
+    pool.map(lambda i: wechat.send_text_message('openid', u'你好'), range(number))
+    elapsed = time.time() - start
+    pool.close()
+    pool.join()
+    print('%-28s %10.0f calls/s' % ('threads (%d workers)' % workers, number / elapsed))
+
+
+def measure_asyncio(number, latency):
+    try:
+        import asyncio
+        from wechat_sdk.aio import AsyncWechatBasic, AsyncMockTransport
+    except (ImportError, SyntaxError):
+        return
+
+    server = MockWechatServer(latency=latency)
+    wechat = AsyncWechatBasic(appid=server.appid, appsecret=server.appsecret, transport=AsyncMockTransport(server))
+
+    def run():
+        return asyncio.gather(*[wechat.send_text_message('openid', u'你好') for i in range(number)])
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(wechat.ensure_access_token())
+    start = time.time()
+    loop.run_until_complete(run())
+    elapsed = time.time() - start
+    loop.close()
+    print('%-28s %10.0f calls/s' % ('asyncio (single loop)', number / elapsed))
+
+
+def main(number=2000, latency_ms=20):
+    measure_overhead(number)
+    latency = latency_ms / 1000.0
+    print('\nlatency %d ms, %d calls' % (latency_ms, number))
+    measure_threads(number, latency, 10)
+    measure_threads(number, latency, 100)
+    measure_asyncio(number, latency)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+XMLStore 解析引擎基准测试: 对比 minidom 与流式解析器处理每种消息类型的耗时
+
+运行方式 (项目根目录下): PYTHONPATH=. python benchmarks/bench_xmlstore.py [次数]
+"""
+from __future__ import print_function
+
+import sys
+import timeit
+
+from samples import SAMPLES
+from wechat_sdk.lib import XMLStore
+
+
+def main(number=20000):
+    print('%-30s %14s %14s %8s' % ('message', 'minidom (us)', 'stream (us)', 'speedup'))
+    for name, body in SAMPLES:
+        assert XMLStore(body).xml2dict == XMLStore(body, use_minidom=True).xml2dict
+
+        minidom_time = timeit.timeit(lambda: XMLStore(body, use_minidom=True).xml2dict, number=number)
+        stream_time = timeit.timeit(lambda: XMLStore(body).xml2dict, number=number)
+        print('%-30s %14.2f %14.2f %7.2fx' % (
+            name,
+            minidom_time / number * 1e6,
+            stream_time / number * 1e6,
+            minidom_time / stream_time,
+        ))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+"""
+基于 asyncio 的微信公众平台 API 客户端
+
+本模块使用 async/await 语法, 仅支持 Python 3.5 及以上版本, 不会被 wechat_sdk 包自动导入
+"""
+
+import asyncio
+import functools
+import json
+
+import requests
+
+from . import credential
+from .basic import WechatBasic
+from .exceptions import OfficialAPIError
+from .retry import ERROR_TOKEN, ERROR_RETRY
+from .transport import Response
+
+try:
+    import aiohttp
+except ImportError:  # 未安装 aiohttp 时使用线程池中的 requests 发送请求
+    aiohttp = None
+
+# Python 3.7 以下没有 asyncio.get_running_loop, 在协程中调用 get_event_loop 同样返回正在运行的事件循环
+_get_running_loop = getattr(asyncio, 'get_running_loop', asyncio.get_event_loop)
+
+
+# 异步传输层返回的响应, 与同步传输层使用相同的实现
+AsyncResponse = Response
+
+
+class BaseAsyncTransport(object):
+    """
+    异步传输层基类
+
+    子类需实现 request 协程, 参数与 requests.request 的同名参数一致, 返回 AsyncResponse 或 requests.Response 对象
+    """
+    async def request(self, method, url, params=None, data=None, files=None, headers=None, stream=False):
+        raise NotImplementedError()
+
+    async def close(self):
+        pass
+
+
+class ExecutorTransport(BaseAsyncTransport):
+    """
+    在线程池中使用 requests.Session 发送请求的异步传输层, 无需额外依赖
+    """
+    def __init__(self, session=None, executor=None):
+        """
+        :param session: requests.Session 实例, 不传入时新建
+        :param executor: concurrent.futures.Executor 实例, 不传入时使用事件循环的默认线程池
+        """
+        self.session = session or requests.Session()
+        self.executor = executor
+
+    async def request(self, method, url, params=None, data=None, files=None, headers=None, stream=False):
+        loop = _get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(
+            self.session.request, method, url, params=params, data=data, files=files, headers=headers, stream=stream,
+        ))
+
+
+class AiohttpTransport(BaseAsyncTransport):
+    """
+    使用 aiohttp 发送请求的异步传输层, 所有请求在事件循环中完成, 不占用线程
+    """
+    def __init__(self, session=None, limit=100, limit_per_host=0):
+        """
+        :param session: aiohttp.ClientSession 实例, 不传入时在第一次请求时新建
+        :param limit: 新建 ClientSession 时的连接总数上限
+        :param limit_per_host: 新建 ClientSession 时每个主机的连接数上限, 0 表示不限制
+        """
+        if aiohttp is None:
+            raise ImportError('AiohttpTransport requires aiohttp to be installed.')
+        self._session = session
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+
+    @property
+    def session(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self._limit, limit_per_host=self._limit_per_host)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def request(self, method, url, params=None, data=None, files=None, headers=None, stream=False):
+        if files:
+            form = aiohttp.FormData()
+            for name, (filename, fileobj, content_type) in files.items():
+                form.add_field(name, fileobj, filename=filename, content_type=content_type)
+            data = form
+        async with self.session.request(method, url, params=params, data=data, headers=headers) as response:
+            content = await response.read()
+            return AsyncResponse(response.status, content, dict(response.headers), str(response.url))
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class AsyncMockTransport(BaseAsyncTransport):
+    """
+    将请求交给进程内的 MockWechatServer 处理的异步传输层, 延迟通过 asyncio.sleep 模拟, 不访问网络
+    """
+    def __init__(self, server):
+        """
+        :param server: wechat_sdk.mock.MockWechatServer 实例
+        """
+        self.server = server
+
+    async def request(self, method, url, params=None, data=None, files=None, headers=None, stream=False):
+        latency = self.server.get_latency()
+        if latency > 0:
+            await asyncio.sleep(latency)
+        return self.server.handle(method, url, params=params, data=data, files=files, headers=headers)
+
+
+def default_transport(session=None):
+    """
+    获取默认的异步传输层: 已安装 aiohttp 时使用 AiohttpTransport, 否则使用 ExecutorTransport
+    :param session: 使用 ExecutorTransport 时复用的 requests.Session 实例
+    """
+    if aiohttp is not None:
+        return AiohttpTransport()
+    return ExecutorTransport(session)
+
+
+class _Placeholder(object):
+    """
+    尚未获取的 access_token 的占位符, 由 AsyncWechatBasic._request 在发送请求前替换为实际值
+    """
+    def __repr__(self):
+        return '<access_token placeholder>'
+
+
+ACCESS_TOKEN = _Placeholder()
+
+
+class AsyncWechatBasic(WechatBasic):
+    """
+    微信基本功能类的 asyncio 版本
+
+    所有访问微信服务器的方法 (send_text_message, get_user_info, create_qrcode, send_template_message 等) 与 WechatBasic
+    参数相同, 但均为协程, 需要使用 await 调用. access_token 与 jsapi_ticket 的缓存及官方错误检查与 WechatBasic 一致,
+    刷新时与同一进程中使用相同 appid 的其他实例 (包括同步的 WechatBasic) 共享刷新锁, 并同样使用 lock_factory 及 token_store,
+    同一时刻只有一个刷新请求. 等待锁及读写 token_store 均在线程池中进行, 不会阻塞事件循环
+    """
+    def __init__(self, *args, transport=None, **kwargs):
+        """
+        参数与 WechatBasic 相同
+        :param transport: 异步传输层, BaseAsyncTransport 实例, 不传入时使用 default_transport()
+        """
+        super(AsyncWechatBasic, self).__init__(*args, **kwargs)
+        self.__transport = transport or default_transport(self.session)
+        self.__locks = {}  # 凭证名称 -> asyncio.Lock, 合并同一实例中并发的刷新
+
+    @property
+    def transport(self):
+        """
+        使用的异步传输层
+        """
+        return self.__transport
+
+    @property
+    def access_token(self):
+        """
+        缓存的 access_token, 不存在或即将过期时返回占位符, 由请求发送前自动获取并替换. 需要实际值时请使用 ensure_access_token()
+        """
+        self._check_appid_appsecret()
+
+        access_token = self._get_cached_access_token()
+        return ACCESS_TOKEN if access_token is None else access_token
+
+    @property
+    def jsapi_ticket(self):
+        """
+        缓存的 jsapi_ticket, 不存在或即将过期时返回 None. 需要实际值时请使用 ensure_jsapi_ticket()
+        """
+        self._check_appid_appsecret()
+
+        return self._get_cached_jsapi_ticket()
+
+    async def ensure_access_token(self):
+        """
+        获取有效的 access_token, 不存在或即将过期时重新获取
+        :return: access_token
+        """
+        self._check_appid_appsecret()
+
+        access_token = self._get_cached_access_token()
+        if access_token is None:
+            access_token = await self._refresh_credential_async(credential.ACCESS_TOKEN)
+        return access_token
+
+    async def ensure_jsapi_ticket(self):
+        """
+        获取有效的 jsapi_ticket, 不存在或即将过期时重新获取
+        :return: jsapi_ticket
+        """
+        self._check_appid_appsecret()
+
+        jsapi_ticket = self._get_cached_jsapi_ticket()
+        if jsapi_ticket is None:
+            jsapi_ticket = await self._refresh_credential_async(credential.JSAPI_TICKET)
+        return jsapi_ticket
+
+    async def get_access_token(self):
+        await self.ensure_access_token()
+        return super(AsyncWechatBasic, self).get_access_token()
+
+    async def get_jsapi_ticket(self):
+        await self.ensure_jsapi_ticket()
+        return super(AsyncWechatBasic, self).get_jsapi_ticket()
+
+    async def generate_jsapi_signature(self, timestamp, noncestr, url, jsapi_ticket=None):
+        if not jsapi_ticket:
+            jsapi_ticket = await self.ensure_jsapi_ticket()
+        return super(AsyncWechatBasic, self).generate_jsapi_signature(timestamp, noncestr, url, jsapi_ticket)
+
+    async def grant_token(self, override=True):
+        self._check_appid_appsecret()
+
+        response_json = await self._get(
+            url="https://api.weixin.qq.com/cgi-bin/token",
+            params=self._grant_token_params(),
+        )
+        self._record_grant(credential.ACCESS_TOKEN)
+        if override:
+            await self._run_blocking(self._update_access_token, response_json)
+        return response_json
+
+    async def grant_jsapi_ticket(self, override=True):
+        self._check_appid_appsecret()
+
+        response_json = await self._get(
+            url="https://api.weixin.qq.com/cgi-bin/ticket/getticket",
+            params={
+                "access_token": self.access_token,
+                "type": "jsapi",
+            }
+        )
+        self._record_grant(credential.JSAPI_TICKET)
+        if override:
+            await self._run_blocking(self._update_jsapi_ticket, response_json)
+        return response_json
+
+    async def download_media(self, media_id):
+        self._check_appid_appsecret()
+
+        return await self._send(
+            'get',
+            'http://file.api.weixin.qq.com/cgi-bin/media/get',
+            params={
+                'access_token': self.access_token,
+                'media_id': media_id,
+            },
+            stream=True,
+        )
+
+    async def show_qrcode(self, ticket):
+        self._check_appid_appsecret()
+
+        return await self._send(
+            'get',
+            url='https://mp.weixin.qq.com/cgi-bin/showqrcode',
+            params={
+                'ticket': ticket
+            }
+        )
+
+    async def close(self):
+        """
+        关闭异步传输层
+        """
+        await self.__transport.close()
+
+    async def _send(self, method, url, **kwargs):
+        """
+        通过异步传输层发送请求, 发送前将 access_token 占位符替换为实际值
+        :return: 传输层返回的响应对象
+        """
+        params = kwargs.get('params')
+        if params and params.get('access_token') is ACCESS_TOKEN:
+            kwargs['params'] = dict(params, access_token=await self.ensure_access_token())
+        return await self.__transport.request(method, url, **kwargs)
+
+    async def _request(self, method, url, **kwargs):
+        """
+        向微信服务器发送请求
+        :param method: 请求方法
+        :param url: 请求地址
+        :param kwargs: 附加数据
+        :return: 微信服务器响应的 json 数据
+        :raise HTTPError: 微信api http 请求失败
+        """
+        if "params" not in kwargs:
+            kwargs["params"] = {
+                "access_token": self.access_token,
+            }
+        if kwargs["params"].get("access_token") is ACCESS_TOKEN:
+            # 在重试循环之前替换占位符, access_token 失效时才能将实际发送的值标记为已失效
+            kwargs["params"] = dict(kwargs["params"], access_token=await self.ensure_access_token())
+        if isinstance(kwargs.get("data", ""), dict):
+            body = json.dumps(kwargs["data"], ensure_ascii=False)
+            body = body.encode('utf8')
+            kwargs["data"] = body
+
+        policy = self.retry_policy
+        token_refreshed = False
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                wait = self.rate_limiter.reserve(url)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            try:
+                r = await self._send(method, url, **kwargs)
+                r.raise_for_status()
+                response_json = r.json()
+                self._check_official_error(response_json)
+                return response_json
+            except OfficialAPIError as e:
+                if e.errcode == 45009 and self.rate_limiter is not None:
+                    self.rate_limiter.mark_exhausted(url)
+                kind = policy.classify(e.errcode)
+                if kind == ERROR_TOKEN and policy.refresh_token and not token_refreshed \
+                        and kwargs["params"].get("access_token"):
+                    token_refreshed = True
+                    access_token = await self._refresh_access_token(kwargs["params"]["access_token"])
+                    kwargs["params"] = dict(kwargs["params"], access_token=access_token)
+                    self._rewind_files(kwargs)
+                    continue
+                if kind != ERROR_RETRY or attempt >= policy.max_retries:
+                    raise
+            except requests.RequestException as e:
+                if not policy.is_retryable_http_error(e, method) or attempt >= policy.max_retries:
+                    raise
+            await asyncio.sleep(policy.get_delay(attempt))
+            attempt += 1
+            self._rewind_files(kwargs)
+
+    async def _refresh_access_token(self, stale_access_token):
+        """
+        微信服务器提示 access_token 失效时重新获取, 同一时刻每个 appid 只有一个请求在进行
+        :param stale_access_token: 失效的 access_token
+        :return: 新的 access_token
+        """
+        return await self._refresh_credential_async(credential.ACCESS_TOKEN, stale_access_token)
+
+    async def _refresh_credential_async(self, name, stale=None):
+        """
+        _refresh_credential 的协程版本: 依次持有实例内的 asyncio.Lock、进程内共享的刷新锁及 lock_factory 返回的跨进程锁,
+        获得锁后再次检查本地缓存、进程内最近一次获取到的值及 token_store, 均不可用时才请求微信服务器
+        :param name: 凭证名称, ACCESS_TOKEN 或 JSAPI_TICKET
+        :param stale: 已知失效的值
+        :return: 有效的凭证值
+        """
+        get_cached = self._get_cached_access_token if name == credential.ACCESS_TOKEN else self._get_cached_jsapi_ticket
+        if name not in self.__locks:
+            self.__locks[name] = asyncio.Lock()
+        async with self.__locks[name]:
+            value = get_cached()
+            if value is not None and value != stale:
+                return value
+            key = credential.credential_key(self.appid, name)
+            locks = [self.refresh_states.get(key).lock]
+            if self.lock_factory is not None:
+                locks.append(self.lock_factory(key))
+            acquired = []
+            try:
+                for lock in locks:
+                    await self._acquire_lock(lock)
+                    acquired.append(lock)
+                value = get_cached()
+                if value is not None and value != stale:
+                    return value
+                value = await self._run_blocking(self._load_credential, name, stale)
+                if value is not None:
+                    return value
+                if name == credential.ACCESS_TOKEN:
+                    return (await self.grant_token())['access_token']
+                return (await self.grant_jsapi_ticket())['ticket']
+            finally:
+                for lock in reversed(acquired):
+                    lock.release()
+
+    async def _acquire_lock(self, lock):
+        """
+        在线程池中等待阻塞的锁, 协程被取消时在获得锁后立即释放
+        """
+        future = _get_running_loop().run_in_executor(None, lock.acquire)
+        try:
+            await asyncio.shield(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(lambda f: lock.release() if not f.cancelled() and f.exception() is None else None)
+            raise
+
+    async def _run_blocking(self, func, *args):
+        """
+        在线程池中执行可能阻塞的函数, 如读写 token_store 及凭证快照
+        """
+        return await _get_running_loop().run_in_executor(None, functools.partial(func, *args))
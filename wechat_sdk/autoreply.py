@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+# 关键词匹配方式
+MATCH_EXACT = 'exact'  # 内容与关键词完全相同
+MATCH_PREFIX = 'prefix'  # 内容以关键词开头
+MATCH_CONTAINS = 'contains'  # 内容包含关键词
+
+_MODE_ORDER = {
+    MATCH_EXACT: 2,
+    MATCH_PREFIX: 1,
+    MATCH_CONTAINS: 0,
+}
+
+
+class KeywordRule(object):
+    """
+    关键词自动回复规则
+    """
+    def __init__(self, keyword, reply, mode=MATCH_CONTAINS, priority=0):
+        """
+        :param keyword: 关键词
+        :param reply: 回复内容, 为字符串时回复文字消息, 为 list 对象时回复图文消息 (每个元素为一个 dict 对象, key 包含 `title`, `description`, `picurl`, `url`)
+        :param mode: 匹配方式, 可选 MATCH_EXACT, MATCH_PREFIX, MATCH_CONTAINS (默认)
+        :param priority: 优先级, 同时匹配多条规则时优先级高者胜出
+        """
+        if not keyword:
+            raise ValueError('Parameter keyword can not be empty.')
+        if mode not in _MODE_ORDER:
+            raise ValueError('Parameter mode must be one of MATCH_EXACT, MATCH_PREFIX and MATCH_CONTAINS.')
+
+        self.keyword = keyword
+        self.reply = reply
+        self.mode = mode
+        self.priority = priority
+
+
+class _Automaton(object):
+    """
+    由全部规则的关键词构建的 Aho-Corasick 自动机, 构建完成后不再修改
+    """
+    def __init__(self, rules):
+        self.rules = rules
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+
+        for index, rule in enumerate(rules):
+            node = 0
+            for char in rule.keyword:
+                next_node = self.goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self.goto)
+                    self.goto[node][char] = next_node
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                node = next_node
+            self.output[node] += (index, )
+
+        # 按广度优先顺序计算失配指针, 并将失配节点的输出合并到当前节点
+        queue = list(self.goto[0].values())
+        for node in queue:
+            for char, next_node in self.goto[node].items():
+                queue.append(next_node)
+                fail = self.fail[node]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[next_node] = self.goto[fail].get(char, 0)
+                self.output[next_node] += self.output[self.fail[next_node]]
+
+    def search(self, text):
+        """
+        对 text 进行一次扫描, 找出所有符合匹配方式的规则
+        :return: list 对象, 每个元素为 (规则序号, 关键词起始位置)
+        """
+        goto, fail, output, rules = self.goto, self.fail, self.output, self.rules
+        length = len(text)
+        matches = []
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for index in output[node]:
+                rule = rules[index]
+                start = position - len(rule.keyword) + 1
+                if rule.mode == MATCH_CONTAINS or \
+                        (start == 0 and (rule.mode == MATCH_PREFIX or position == length - 1)):
+                    matches.append((index, start))
+        return matches
+
+
+class KeywordMatcher(object):
+    """
+    关键词自动回复引擎
+
+    将全部规则的关键词编译为 Aho-Corasick 自动机, 对消息内容只扫描一次即可找出所有匹配的规则.
+    规则变更时在新的自动机上完成构建后再整体替换, 正在进行的匹配不受影响 ::
+
+        matcher = KeywordMatcher([
+            KeywordRule(u'帮助', u'回复 1 查看今日歌曲', mode=MATCH_EXACT, priority=10),
+            KeywordRule(u'歌曲', [{'title': u'今日歌曲', 'url': 'http://example.com/'}]),
+        ])
+
+        response = matcher.respond(wechat, message)
+    """
+    def __init__(self, rules=None):
+        """
+        :param rules: KeywordRule 对象列表
+        """
+        self._lock = threading.Lock()
+        self._automaton = _Automaton(list(rules or []))
+
+    @property
+    def rules(self):
+        """
+        当前生效的全部规则
+        """
+        return list(self._automaton.rules)
+
+    def set_rules(self, rules):
+        """
+        替换全部规则
+        :param rules: KeywordRule 对象列表
+        """
+        automaton = _Automaton(list(rules))
+        with self._lock:
+            self._automaton = automaton
+
+    def add_rules(self, rules):
+        """
+        添加规则
+        :param rules: KeywordRule 对象列表
+        """
+        with self._lock:
+            self._automaton = _Automaton(self._automaton.rules + list(rules))
+
+    def remove_rules(self, keyword):
+        """
+        删除指定关键词的全部规则
+        :param keyword: 关键词
+        """
+        with self._lock:
+            self._automaton = _Automaton([rule for rule in self._automaton.rules if rule.keyword != keyword])
+
+    def match_all(self, content):
+        """
+        找出所有与 content 匹配的规则
+        :param content: 文本内容
+        :return: KeywordRule 对象列表, 按优先级从高到低排列; 优先级相同时依次按匹配方式 (完全匹配 > 前缀匹配 > 包含匹配),
+                 关键词长度 (长者优先), 添加顺序排列
+        """
+        automaton = self._automaton
+        if not content or not automaton.rules:
+            return []
+
+        indexes = set(index for index, _ in automaton.search(content))
+        rules = automaton.rules
+        return [rules[index] for index in sorted(indexes, key=lambda index: (
+            -rules[index].priority,
+            -_MODE_ORDER[rules[index].mode],
+            -len(rules[index].keyword),
+            index,
+        ))]
+
+    def match(self, content):
+        """
+        找出与 content 匹配的最佳规则
+        :param content: 文本内容
+        :return: KeywordRule 对象, 没有匹配的规则时返回 None
+        """
+        rules = self.match_all(content)
+        return rules[0] if rules else None
+
+    def respond(self, wechat, message):
+        """
+        根据文本消息的内容生成自动回复
+        :param wechat: WechatBasic 实例, 用于组装响应数据
+        :param message: 消息对象
+        :return: 符合微信服务器要求的 XML 响应数据, 消息不是文本消息或没有匹配的规则时返回 None
+        """
+        rule = self.match(getattr(message, 'content', None))
+        if rule is None:
+            return None
+        if isinstance(rule.reply, list):
+            return wechat.reply_news(message, [dict(article) for article in rule.reply])
+        return wechat.reply_text(message, rule.reply)
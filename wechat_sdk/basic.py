@@ -4,15 +4,24 @@ import hashlib
 import requests
 import time
 import json
-import cgi
 from io import StringIO
 
 from xml.dom import minidom
 
-from .messages import MESSAGE_TYPES, UnknownMessage
-from .exceptions import ParseError, NeedParseError, NeedParamError, OfficialAPIError
+try:
+    from html import escape as html_escape
+except ImportError:  # Python 2, cgi.escape 在 Python 3.8 中已被移除
+    from cgi import escape as html_escape
+
+from .decoder import MessageDecoder, to_bytes
+from .exceptions import NeedParseError, NeedParamError, OfficialAPIError
 from .reply import TextReply, ImageReply, VoiceReply, VideoReply, MusicReply, Article, ArticleReply
-from .lib import disable_urllib3_warning, XMLStore
+from .lib import disable_urllib3_warning
+from .session import create_session, get_pool_stats
+from .transport import RequestsTransport
+from .retry import RetryPolicy, ERROR_TOKEN, ERROR_RETRY, get_override, override
+from .jssdk import sign_jsapi
+from .credential import ACCESS_TOKEN, JSAPI_TICKET, credential_key, default_refresh_states, get_snapshot
 
 
 class WechatBasic(object):
@@ -23,7 +32,10 @@ class WechatBasic(object):
     """
     def __init__(self, token=None, appid=None, appsecret=None, partnerid=None,
                  partnerkey=None, paysignkey=None, access_token=None, access_token_expires_at=None,
-                 jsapi_ticket=None, jsapi_ticket_expires_at=None, checkssl=False):
+                 jsapi_ticket=None, jsapi_ticket_expires_at=None, checkssl=False, decoder=None,
+                 session=None, pool_sizes=None, transport=None, retry_policy=None, rate_limiter=None,
+                 lock_factory=None, token_store=None, persist_path=None, dedup=None,
+                 refresh_states=None):
         """
         :param token: 微信 Token
         :param appid: App ID
@@ -36,6 +48,22 @@ class WechatBasic(object):
         :param jsapi_ticket: 直接导入的 jsapi_ticket 值, 该值需要在上一次该类实例化之后手动进行缓存并在此处传入, 如果不传入, 将会在需要时自动重新获取
         :param jsapi_ticket_expires_at: 直接导入的 jsapi_ticket 的过期日期，该值需要在上一次该类实例化之后手动进行缓存并在此处传入, 如果不传入, 将会在需要时自动重新获取
         :param checkssl: 是否检查 SSL, 默认为 False, 可避免 urllib3 的 InsecurePlatformWarning 警告
+        :param decoder: 解析微信服务器数据使用的 MessageDecoder 实例, 如果不传入, 将会自动创建
+        :param session: 访问微信服务器使用的 requests.Session 实例, 如果不传入, 将会自动创建带 keep-alive 连接池的 Session
+        :param pool_sizes: 自动创建 Session 时各主机的连接池大小, 主机 -> 连接池大小的 dict, 如 {'api.weixin.qq.com': 20}
+        :param transport: 发送 HTTP 请求使用的传输层, wechat_sdk.transport.BaseTransport 实例, 如果不传入, 将会使用 session 发送请求
+        :param retry_policy: 官方 API 请求的重试策略, wechat_sdk.retry.RetryPolicy 实例, 如果不传入, 将会使用默认策略
+        :param rate_limiter: 官方 API 请求的限流器, wechat_sdk.ratelimit.RateLimiter 实例, 如果不传入, 将不进行限流
+        :param lock_factory: 跨进程刷新锁工厂, 接收锁名称并返回支持 with 语句的锁, 如 wechat_sdk.credential.FileLockFactory 实例,
+                             如果不传入, 只在进程内保证同一 appid 同一时刻只有一个刷新 access_token 及 jsapi_ticket 的请求
+        :param token_store: 共享的凭证存储, wechat_sdk.credential.BaseTokenStore 实例, 本地缓存的 access_token 及 jsapi_ticket
+                            不存在或即将过期时从中读取, 获取新的值后写入其中, 如果不传入, 凭证只缓存在当前实例中
+        :param persist_path: 凭证快照文件路径, 获取新的 access_token 及 jsapi_ticket 后原子地写入其中, 创建实例时从中读取仍然有效的值,
+                             使重启后的进程无需请求微信服务器, 如果不传入, 不保存快照
+        :param dedup: 消息去重器, wechat_sdk.dedup.MessageDeduplicator 实例, 传入后 handle_message 只对首次推送调用处理函数,
+                      如果不传入, 不进行去重
+        :param refresh_states: 凭证刷新状态的集合, wechat_sdk.credential.RefreshStateRegistry 实例, 使用同一个集合且 appid 相同的实例
+                               共享刷新锁及最近一次获取到的凭证, 如果不传入, 将会使用进程内共享的集合
         """
         if not checkssl:
             disable_urllib3_warning()  # 可解决 InsecurePlatformWarning 警告
@@ -51,9 +79,22 @@ class WechatBasic(object):
         self.__access_token_expires_at = access_token_expires_at
         self.__jsapi_ticket = jsapi_ticket
         self.__jsapi_ticket_expires_at = jsapi_ticket_expires_at
+        self.__decoder = decoder or MessageDecoder()
+        self.__session = session or create_session(pool_sizes)
+        self.__transport = transport or RequestsTransport(self.__session)
+        self.__retry_policy = retry_policy or RetryPolicy()
+        self.__rate_limiter = rate_limiter
+        self.__lock_factory = lock_factory
+        self.__token_store = token_store
+        self.__snapshot = get_snapshot(persist_path) if persist_path else None
+        self.__dedup = dedup
+        self.__refresh_states = refresh_states or default_refresh_states
         self.__is_parse = False
         self.__message = None
 
+        if self.__snapshot is not None and self.__appid:
+            self._load_snapshot()
+
     def check_signature(self, signature, timestamp, nonce):
         """
         验证微信消息真实性
@@ -83,20 +124,11 @@ class WechatBasic(object):
         :param url: 要签名的 url，不包含 # 及其后面部分
         :param jsapi_ticket: (可选参数) jsapi_ticket 值 (如不提供将自动通过 appid 和 appsecret 获取)
         :return: 返回sha1签名的hexdigest值
+        需要为页面生成完整的 wx.config 配置时请使用 wechat_sdk.jssdk.JsapiConfig, 其中缓存了签名
         """
         if not jsapi_ticket:
             jsapi_ticket = self.jsapi_ticket
-        data = {
-            'jsapi_ticket': jsapi_ticket,
-            'noncestr': noncestr,
-            'timestamp': timestamp,
-            'url': url,
-        }
-        keys = data.keys()
-        keys.sort()
-        data_str = '&'.join(['%s=%s' % (key, data[key]) for key in keys])
-        signature = hashlib.sha1(data_str.encode('utf-8')).hexdigest()
-        return signature
+        return sign_jsapi(jsapi_ticket, noncestr, timestamp, url)
 
     def parse_data(self, data):
         """
@@ -104,31 +136,149 @@ class WechatBasic(object):
         :param data: HTTP Request 的 Body 数据
         :raises ParseError: 解析微信服务器数据错误, 数据不合法
         """
-        result = {}
-        if type(data) == str:
-            data = data.encode('utf-8')
-        elif type(data) == bytes:
-            pass
-        else:
-            raise ParseError()
+        self.__message = self.parse_message(data)
+        self.__is_parse = True
 
-        try:
-            xml = XMLStore(xmlstring=data)
-        except Exception:
-            raise ParseError()
+    def parse_message(self, data):
+        """
+        解析微信服务器发送过来的数据并直接返回, 不保存在类中
 
-        result = xml.xml2dict
-        result['raw'] = data
-        result['type'] = result.pop('MsgType').lower()
+        该方法不修改实例状态, 可在多线程 / 协程间共享同一个 WechatBasic 实例并发调用, 配合 reply_* 系列方法使用
+        :param data: HTTP Request 的 Body 数据
+        :return: 解析好的 WechatMessage 对象
+        :raises ParseError: 解析微信服务器数据错误, 数据不合法
+        """
+        return self.__decoder.decode(to_bytes(data))
 
-        message_type = MESSAGE_TYPES.get(result['type'], UnknownMessage)
-        self.__message = message_type(result)
-        self.__is_parse = True
+    def handle_message(self, data, handler):
+        """
+        解析微信服务器发送过来的数据并调用处理函数, 返回处理函数的返回值 (响应数据), 不保存在类中
+
+        构造时传入了 dedup 时, 微信服务器对同一条消息的重试推送不会再次调用处理函数, 而是返回首次处理得到的响应数据,
+        首次推送仍在处理中时最多阻塞当前线程 dedup 的 wait 秒
+        :param data: HTTP Request 的 Body 数据
+        :param handler: 处理函数 (同步函数), 接受 WechatMessage 对象作为参数, 返回响应数据, 如 reply_text 的返回值或 MessageRouter.dispatch
+        :return: 响应数据
+        :raises ParseError: 解析微信服务器数据错误, 数据不合法
+        """
+        message = self.parse_message(data)
+        if self.__dedup is None:
+            return handler(message)
+        return self.__dedup.handle(message, handler)
+
+    def parse_messages(self, payloads, processes=None, chunksize=256, ordered=True):
+        """
+        批量解析微信服务器发送过来的数据 (如重放归档的历史推送数据), 以生成器的方式逐条返回, 不保存在类中
+        :param payloads: 可迭代对象, 每个元素为一条 HTTP Request 的 Body 数据
+        :param processes: 进程池大小, 默认为 None 表示在当前进程中逐条解析; 传入整数时按 chunksize 分块分发到进程池中并行解析
+        :param chunksize: 分发到进程池时每个数据块包含的数据条数
+        :param ordered: 使用进程池时是否保持与输入一致的顺序 (默认为 True)
+        :return: 生成器, 每个元素为解析好的 WechatMessage 对象
+        :raises ParseError: 解析微信服务器数据错误, 数据不合法
+        """
+        return self.__decoder.decode_many(payloads, processes=processes, chunksize=chunksize, ordered=ordered)
 
     @property
     def message(self):
         return self.get_message()
 
+    @property
+    def appid(self):
+        return self.__appid
+
+    @property
+    def session(self):
+        """
+        访问微信服务器使用的 requests.Session 实例
+        """
+        return self.__session
+
+    @property
+    def transport(self):
+        """
+        发送 HTTP 请求使用的传输层
+        """
+        return self.__transport
+
+    @property
+    def retry_policy(self):
+        """
+        当前生效的重试策略, with_retry_policy 上下文中为其设置的策略, 否则为构造时传入的策略
+        """
+        return get_override(self) or self.__retry_policy
+
+    @property
+    def dedup(self):
+        """
+        handle_message 使用的消息去重器, 未配置时为 None
+        """
+        return self.__dedup
+
+    @property
+    def rate_limiter(self):
+        """
+        官方 API 请求的限流器, 未设置时为 None
+        """
+        return self.__rate_limiter
+
+    @property
+    def token_store(self):
+        """
+        共享的凭证存储, 未配置时为 None
+        """
+        return self.__token_store
+
+    @property
+    def refresh_states(self):
+        """
+        凭证刷新状态的集合
+        """
+        return self.__refresh_states
+
+    @property
+    def lock_factory(self):
+        """
+        跨进程刷新锁工厂, 未配置时为 None
+        """
+        return self.__lock_factory
+
+    def with_retry_policy(self, policy=None, **kwargs):
+        """
+        返回上下文管理器, 在 with 块内的官方 API 请求使用指定的重试策略, 只对当前线程 (协程) 生效, 例如:
+            with wechat.with_retry_policy(max_retries=5):
+                wechat.send_text_message(user_id, content)
+        :param policy: RetryPolicy 对象, 不传入时以当前生效的策略为基础
+        :param kwargs: 需要修改的 RetryPolicy 参数
+        """
+        policy = policy or self.retry_policy
+        if kwargs:
+            policy = policy.replace(**kwargs)
+        return override(self, policy)
+
+    def get_grant_usage(self):
+        """
+        获取当前进程中该 appid 当日 (北京时间) 成功获取 access_token 及 jsapi_ticket 的次数,
+        用于监控获取 access_token 接口的每日调用次数上限 (2000 次)
+        :return: dict 对象, key 包括 `access_token` 及 `jsapi_ticket`
+        """
+        return dict((name, self.__refresh_states.get(credential_key(self.__appid, name)).get_grants())
+                    for name in (ACCESS_TOKEN, JSAPI_TICKET))
+
+    def get_pool_stats(self):
+        """
+        获取 HTTP 连接池的统计数据
+        :return: dict, 包含请求数 (requests), 新建连接数 (connections), 连接复用率 (reuse_ratio),
+                 空闲连接数 (idle_connections), 使用中的连接数 (active_connections) 及按主机统计的相同数据 (hosts)
+        """
+        return get_pool_stats(self.__session)
+
+    @property
+    def decoder(self):
+        """
+        解析微信服务器数据使用的 MessageDecoder 实例, 可通过其 `stats` 属性查看快速路径命中情况
+        """
+        return self.__decoder
+
     def get_message(self):
         """
         获取解析好的 WechatMessage 对象
@@ -170,11 +320,8 @@ class WechatBasic(object):
         :return: 符合微信服务器要求的 XML 响应数据
         """
         self._check_parse()
-        content = self._transcoding(content)
-        if escape:
-            content = cgi.escape(content)
 
-        return TextReply(message=self.__message, content=content).render()
+        return self.reply_text(self.__message, content, escape=escape)
 
     def response_image(self, media_id):
         """
@@ -184,7 +331,7 @@ class WechatBasic(object):
         """
         self._check_parse()
 
-        return ImageReply(message=self.__message, media_id=media_id).render()
+        return self.reply_image(self.__message, media_id)
 
     def response_voice(self, media_id):
         """
@@ -194,7 +341,7 @@ class WechatBasic(object):
         """
         self._check_parse()
 
-        return VoiceReply(message=self.__message, media_id=media_id).render()
+        return self.reply_voice(self.__message, media_id)
 
     def response_video(self, media_id, title=None, description=None):
         """
@@ -205,10 +352,8 @@ class WechatBasic(object):
         :return: 符合微信服务器要求的 XML 响应数据
         """
         self._check_parse()
-        title = self._transcoding(title)
-        description = self._transcoding(description)
 
-        return VideoReply(message=self.__message, media_id=media_id, title=title, description=description).render()
+        return self.reply_video(self.__message, media_id, title=title, description=description)
 
     def response_music(self, music_url, title=None, description=None, hq_music_url=None, thumb_media_id=None):
         """
@@ -221,21 +366,92 @@ class WechatBasic(object):
         :return: 符合微信服务器要求的 XML 响应数据
         """
         self._check_parse()
+
+        return self.reply_music(self.__message, music_url, title=title, description=description,
+                                hq_music_url=hq_music_url, thumb_media_id=thumb_media_id)
+
+    def response_news(self, articles):
+        """
+        将新闻信息组装为符合微信服务器要求的响应数据
+        :param articles: list 对象, 每个元素为一个 dict 对象, key 包含 `title`, `description`, `picurl`, `url`
+        :return: 符合微信服务器要求的 XML 响应数据
+        """
+        self._check_parse()
+
+        return self.reply_news(self.__message, articles)
+
+    def reply_text(self, message, content, escape=False):
+        """
+        针对指定的 message 将文字信息 content 组装为符合微信服务器要求的响应数据, 不依赖实例中保存的解析结果
+        :param message: 由 :func:`parse_message` 返回的 WechatMessage 对象
+        :param content: 回复文字
+        :param escape: 是否转义该文本内容 (默认不转义)
+        :return: 符合微信服务器要求的 XML 响应数据
+        """
+        content = self._transcoding(content)
+        if escape:
+            content = html_escape(content, quote=False)
+
+        return TextReply(message=message, content=content).render()
+
+    def reply_image(self, message, media_id):
+        """
+        针对指定的 message 将 media_id 所代表的图片组装为符合微信服务器要求的响应数据, 不依赖实例中保存的解析结果
+        :param message: 由 :func:`parse_message` 返回的 WechatMessage 对象
+        :param media_id: 图片的 MediaID
+        :return: 符合微信服务器要求的 XML 响应数据
+        """
+        return ImageReply(message=message, media_id=media_id).render()
+
+    def reply_voice(self, message, media_id):
+        """
+        针对指定的 message 将 media_id 所代表的语音组装为符合微信服务器要求的响应数据, 不依赖实例中保存的解析结果
+        :param message: 由 :func:`parse_message` 返回的 WechatMessage 对象
+        :param media_id: 语音的 MediaID
+        :return: 符合微信服务器要求的 XML 响应数据
+        """
+        return VoiceReply(message=message, media_id=media_id).render()
+
+    def reply_video(self, message, media_id, title=None, description=None):
+        """
+        针对指定的 message 将 media_id 所代表的视频组装为符合微信服务器要求的响应数据, 不依赖实例中保存的解析结果
+        :param message: 由 :func:`parse_message` 返回的 WechatMessage 对象
+        :param media_id: 视频的 MediaID
+        :param title: 视频消息的标题
+        :param description: 视频消息的描述
+        :return: 符合微信服务器要求的 XML 响应数据
+        """
+        title = self._transcoding(title)
+        description = self._transcoding(description)
+
+        return VideoReply(message=message, media_id=media_id, title=title, description=description).render()
+
+    def reply_music(self, message, music_url, title=None, description=None, hq_music_url=None, thumb_media_id=None):
+        """
+        针对指定的 message 将音乐信息组装为符合微信服务器要求的响应数据, 不依赖实例中保存的解析结果
+        :param message: 由 :func:`parse_message` 返回的 WechatMessage 对象
+        :param music_url: 音乐链接
+        :param title: 音乐标题
+        :param description: 音乐描述
+        :param hq_music_url: 高质量音乐链接, WIFI环境优先使用该链接播放音乐
+        :param thumb_media_id: 缩略图的 MediaID
+        :return: 符合微信服务器要求的 XML 响应数据
+        """
         music_url = self._transcoding(music_url)
         title = self._transcoding(title)
         description = self._transcoding(description)
         hq_music_url = self._transcoding(hq_music_url)
 
-        return MusicReply(message=self.__message, title=title, description=description, music_url=music_url,
+        return MusicReply(message=message, title=title, description=description, music_url=music_url,
                           hq_music_url=hq_music_url, thumb_media_id=thumb_media_id).render()
 
-    def response_news(self, articles):
+    def reply_news(self, message, articles):
         """
-        将新闻信息组装为符合微信服务器要求的响应数据
+        针对指定的 message 将新闻信息组装为符合微信服务器要求的响应数据, 不依赖实例中保存的解析结果
+        :param message: 由 :func:`parse_message` 返回的 WechatMessage 对象
         :param articles: list 对象, 每个元素为一个 dict 对象, key 包含 `title`, `description`, `picurl`, `url`
         :return: 符合微信服务器要求的 XML 响应数据
         """
-        self._check_parse()
         for article in articles:
             if article.get('title'):
                 article['title'] = self._transcoding(article['title'])
@@ -246,7 +462,7 @@ class WechatBasic(object):
             if article.get('url'):
                 article['url'] = self._transcoding(article['url'])
 
-        news = ArticleReply(message=self.__message)
+        news = ArticleReply(message=message)
         for article in articles:
             article = Article(**article)
             news.add_article(article)
@@ -264,28 +480,23 @@ class WechatBasic(object):
 
         response_json = self._get(
             url="https://api.weixin.qq.com/cgi-bin/token",
-            params={
-                "grant_type": "client_credential",
-                "appid": self.__appid,
-                "secret": self.__appsecret,
-            }
+            params=self._grant_token_params(),
         )
+        self._record_grant(ACCESS_TOKEN)
         if override:
-            self.__access_token = response_json['access_token']
-            self.__access_token_expires_at = int(time.time()) + response_json['expires_in']
+            self._update_access_token(response_json)
         return response_json
 
     def grant_jsapi_ticket(self, override=True):
         """
         获取 Jsapi Ticket
         详情请参考 http://mp.weixin.qq.com/wiki/7/aaa137b55fb2e0456bf8dd9148dd613f.html#.E9.99.84.E5.BD.951-JS-SDK.E4.BD.BF.E7.94.A8.E6.9D.83.E9.99.90.E7.AD.BE.E5.90.8D.E7.AE.97.E6.B3.95
+        使用缓存的 access_token, 微信服务器提示 access_token 失效时按重试策略重新获取 access_token 后重放请求
         :param override: 是否在获取的同时覆盖已有 jsapi_ticket (默认为True)
         :return: 返回的 JSON 数据包
         :raise HTTPError: 微信api http 请求失败
         """
         self._check_appid_appsecret()
-        # force to grant new access_token to avoid invalid credential issue
-        self.grant_token()
 
         response_json = self._get(
             url="https://api.weixin.qq.com/cgi-bin/ticket/getticket",
@@ -294,9 +505,9 @@ class WechatBasic(object):
                 "type": "jsapi",
             }
         )
+        self._record_grant(JSAPI_TICKET)
         if override:
-            self.__jsapi_ticket = response_json['ticket']
-            self.__jsapi_ticket_expires_at = int(time.time()) + response_json['expires_in']
+            self._update_jsapi_ticket(response_json)
         return response_json
 
     def create_menu(self, menu_data):
@@ -426,7 +637,7 @@ class WechatBasic(object):
         """
         self._check_appid_appsecret()
 
-        return requests.get(
+        return self.__transport.get(
             'http://file.api.weixin.qq.com/cgi-bin/media/get',
             params={
                 'access_token': self.access_token,
@@ -744,7 +955,7 @@ class WechatBasic(object):
         """
         self._check_appid_appsecret()
 
-        return requests.get(
+        return self.__transport.get(
             url='https://mp.weixin.qq.com/cgi-bin/showqrcode',
             params={
                 'ticket': ticket
@@ -839,23 +1050,216 @@ class WechatBasic(object):
     def access_token(self):
         self._check_appid_appsecret()
 
-        if self.__access_token:
-            now = time.time()
-            if self.__access_token_expires_at - now > 60:
-                return self.__access_token
-        self.grant_token()
-        return self.__access_token
+        access_token = self._get_cached_access_token()
+        if access_token is None:
+            access_token = self._load_credential(ACCESS_TOKEN)
+        if access_token is None:
+            access_token = self._refresh_access_token()
+        return access_token
 
     @property
     def jsapi_ticket(self):
         self._check_appid_appsecret()
 
-        if self.__jsapi_ticket:
-            now = time.time()
-            if self.__jsapi_ticket_expires_at - now > 60:
-                return self.__jsapi_ticket
-        self.grant_jsapi_ticket()
-        return self.__jsapi_ticket
+        jsapi_ticket = self._get_cached_jsapi_ticket()
+        if jsapi_ticket is None:
+            jsapi_ticket = self._load_credential(JSAPI_TICKET)
+        if jsapi_ticket is None:
+            jsapi_ticket = self._refresh_jsapi_ticket()
+        return jsapi_ticket
+
+    def _refresh_access_token(self, stale_access_token=None):
+        """
+        重新获取 access_token, 同一时刻每个 appid 只有一个请求在进行
+        进程内使用相同 appid 的实例共享同一把锁, 配置 lock_factory 时同时持有跨进程锁; 获得锁后再次检查,
+        其他调用方已经完成刷新时直接使用新的 access_token
+        :param stale_access_token: 已知失效的 access_token, 缓存中的 access_token 与之相同时同样需要刷新
+        :return: 有效的 access_token
+        """
+        return self._refresh_credential(ACCESS_TOKEN, stale_access_token)
+
+    def _refresh_jsapi_ticket(self, stale_jsapi_ticket=None):
+        """
+        重新获取 jsapi_ticket, 同一时刻每个 appid 只有一个请求在进行, 规则同 _refresh_access_token
+        :param stale_jsapi_ticket: 已知失效的 jsapi_ticket
+        :return: 有效的 jsapi_ticket
+        """
+        return self._refresh_credential(JSAPI_TICKET, stale_jsapi_ticket)
+
+    def _refresh_credential(self, name, stale):
+        """
+        持有刷新锁重新获取凭证, 获得锁后依次检查本地缓存、进程内最近一次获取到的值及共享的凭证存储,
+        均不存在或与 stale 相同时才请求微信服务器
+        :param name: 凭证名称, ACCESS_TOKEN 或 JSAPI_TICKET
+        :param stale: 已知失效的值
+        :return: 有效的凭证值
+        """
+        get_cached = self._get_cached_access_token if name == ACCESS_TOKEN else self._get_cached_jsapi_ticket
+        key = credential_key(self.__appid, name)
+        state = self.__refresh_states.get(key)
+        with state.lock:
+            lock = self.__lock_factory(key) if self.__lock_factory is not None else None
+            if lock is not None:
+                lock.acquire()
+            try:
+                value = get_cached()
+                if value is not None and value != stale:
+                    return value
+                value = self._load_credential(name, stale)
+                if value is not None:
+                    # 同一进程中的其他实例或共享凭证存储的其他进程已经完成刷新
+                    return value
+                if name == ACCESS_TOKEN:
+                    return self.grant_token()['access_token']
+                return self.grant_jsapi_ticket()['ticket']
+            finally:
+                if lock is not None:
+                    lock.release()
+
+    def _load_credential(self, name, stale=None):
+        """
+        从进程内最近一次获取到的值及共享的凭证存储中读取凭证, 并更新本地缓存
+        :param name: 凭证名称, ACCESS_TOKEN 或 JSAPI_TICKET
+        :param stale: 已知失效的值
+        :return: 距离过期还有 60 秒以上的凭证值, 不存在时返回 None
+        """
+        key = credential_key(self.__appid, name)
+        state = self.__refresh_states.get(key)
+        item = (state.value, state.expires_at)
+        if not self._is_usable_credential(item, stale) and self.__token_store is not None:
+            item = self.__token_store.get(key)
+        if not self._is_usable_credential(item, stale):
+            return None
+        value, expires_at = item
+        if name == ACCESS_TOKEN:
+            self._set_access_token(value, expires_at)
+        else:
+            self._set_jsapi_ticket(value, expires_at)
+        return value
+
+    def _get_cached_credential(self, name):
+        """
+        获取本地缓存的凭证及其过期时间, 不检查是否即将过期
+        :param name: 凭证名称, ACCESS_TOKEN 或 JSAPI_TICKET
+        :return: (值, 过期时间戳) tuple, 不存在时返回 None
+        """
+        if name == ACCESS_TOKEN:
+            item = (self.__access_token, self.__access_token_expires_at)
+        else:
+            item = (self.__jsapi_ticket, self.__jsapi_ticket_expires_at)
+        return item if item[0] else None
+
+    def _is_usable_credential(self, item, stale):
+        """
+        判断 (值, 过期时间戳) 是否存在、不同于 stale 且距离过期还有 60 秒以上
+        """
+        return item is not None and item[0] is not None and item[0] != stale and item[1] - time.time() > 60
+
+    def _load_snapshot(self):
+        """
+        从凭证快照中读取仍然有效的 access_token 及 jsapi_ticket, 本地缓存或进程内已有有效值时不读取快照文件
+        """
+        snapshot = None
+        for name in (ACCESS_TOKEN, JSAPI_TICKET):
+            key = credential_key(self.__appid, name)
+            state = self.__refresh_states.get(key)
+            if self._is_usable_credential(self._get_cached_credential(name), None) \
+                    or self._is_usable_credential((state.value, state.expires_at), None):
+                continue
+            if snapshot is None:
+                snapshot = self.__snapshot.load()
+            item = snapshot.get(key)
+            if not self._is_usable_credential(item, None):
+                continue
+            value, expires_at = item
+            # 不持有刷新锁, 避免创建实例时等待其他线程的网络请求
+            state.value, state.expires_at = value, expires_at
+            if name == ACCESS_TOKEN:
+                self._set_access_token(value, expires_at)
+            else:
+                self._set_jsapi_ticket(value, expires_at)
+
+    def _record_grant(self, name):
+        """
+        记录一次成功获取凭证的调用
+        """
+        self.__refresh_states.get(credential_key(self.__appid, name)).record_grant()
+
+    def _publish_credential(self, name, value, expires_at):
+        """
+        将新获取的凭证记录为进程内最近一次获取到的值, 并写入共享的凭证存储及凭证快照
+        """
+        key = credential_key(self.__appid, name)
+        state = self.__refresh_states.get(key)
+        state.value, state.expires_at = value, expires_at
+        if self.__token_store is not None:
+            self.__token_store.set(key, value, expires_at)
+        if self.__snapshot is not None:
+            self.__snapshot.save(key, value, expires_at)
+
+    def _grant_token_params(self):
+        """
+        获取 access_token 接口的请求参数
+        """
+        return {
+            "grant_type": "client_credential",
+            "appid": self.__appid,
+            "secret": self.__appsecret,
+        }
+
+    def _get_cached_access_token(self):
+        """
+        获取缓存的 access_token
+        :return: 距离过期还有 60 秒以上的 access_token, 不存在或即将过期时返回 None
+        """
+        if self.__access_token and self.__access_token_expires_at - time.time() > 60:
+            return self.__access_token
+        return None
+
+    def _update_access_token(self, response_json):
+        """
+        使用获取 access_token 接口返回的数据更新缓存, 并写入共享的凭证存储
+        :param response_json: 获取 access_token 接口返回的 JSON 数据包
+        """
+        expires_at = int(time.time()) + response_json['expires_in']
+        self._set_access_token(response_json['access_token'], expires_at)
+        self._publish_credential(ACCESS_TOKEN, response_json['access_token'], expires_at)
+
+    def _set_access_token(self, access_token, expires_at):
+        """
+        更新缓存的 access_token
+        :param access_token: access_token
+        :param expires_at: 过期时间戳
+        """
+        self.__access_token = access_token
+        self.__access_token_expires_at = expires_at
+
+    def _get_cached_jsapi_ticket(self):
+        """
+        获取缓存的 jsapi_ticket
+        :return: 距离过期还有 60 秒以上的 jsapi_ticket, 不存在或即将过期时返回 None
+        """
+        if self.__jsapi_ticket and self.__jsapi_ticket_expires_at - time.time() > 60:
+            return self.__jsapi_ticket
+        return None
+
+    def _update_jsapi_ticket(self, response_json):
+        """
+        使用获取 jsapi_ticket 接口返回的数据更新缓存, 并写入共享的凭证存储
+        :param response_json: 获取 jsapi_ticket 接口返回的 JSON 数据包
+        """
+        expires_at = int(time.time()) + response_json['expires_in']
+        self._set_jsapi_ticket(response_json['ticket'], expires_at)
+        self._publish_credential(JSAPI_TICKET, response_json['ticket'], expires_at)
+
+    def _set_jsapi_ticket(self, jsapi_ticket, expires_at):
+        """
+        更新缓存的 jsapi_ticket
+        :param jsapi_ticket: jsapi_ticket
+        :param expires_at: 过期时间戳
+        """
+        self.__jsapi_ticket = jsapi_ticket
+        self.__jsapi_ticket_expires_at = expires_at
 
     def _check_token(self):
         """
@@ -887,7 +1291,8 @@ class WechatBasic(object):
         :raises OfficialAPIError: 如果返回码提示有错误，抛出异常；否则返回 True
         """
         if "errcode" in json_data and json_data["errcode"] != 0:
-            raise OfficialAPIError("{}: {}".format(json_data["errcode"], json_data["errmsg"]))
+            raise OfficialAPIError("{}: {}".format(json_data["errcode"], json_data["errmsg"]),
+                                   errcode=json_data["errcode"], errmsg=json_data["errmsg"])
 
     def _request(self, method, url, **kwargs):
         """
@@ -907,15 +1312,51 @@ class WechatBasic(object):
             body = body.encode('utf8')
             kwargs["data"] = body
 
-        r = requests.request(
-            method=method,
-            url=url,
-            **kwargs
-        )
-        r.raise_for_status()
-        response_json = r.json()
-        self._check_official_error(response_json)
-        return response_json
+        policy = self.retry_policy
+        token_refreshed = False
+        attempt = 0
+        while True:
+            if self.__rate_limiter is not None:
+                self.__rate_limiter.acquire(url)
+            try:
+                r = self.__transport.request(
+                    method=method,
+                    url=url,
+                    **kwargs
+                )
+                r.raise_for_status()
+                response_json = r.json()
+                self._check_official_error(response_json)
+                return response_json
+            except OfficialAPIError as e:
+                if e.errcode == 45009 and self.__rate_limiter is not None:
+                    self.__rate_limiter.mark_exhausted(url)
+                kind = policy.classify(e.errcode)
+                if kind == ERROR_TOKEN and policy.refresh_token and not token_refreshed \
+                        and kwargs["params"].get("access_token"):
+                    # access_token 提前失效, 重新获取后立即重放, 只进行一次
+                    token_refreshed = True
+                    access_token = self._refresh_access_token(kwargs["params"]["access_token"])
+                    kwargs["params"] = dict(kwargs["params"], access_token=access_token)
+                    self._rewind_files(kwargs)
+                    continue
+                if kind != ERROR_RETRY or attempt >= policy.max_retries:
+                    raise
+            except requests.RequestException as e:
+                if not policy.is_retryable_http_error(e, method) or attempt >= policy.max_retries:
+                    raise
+            time.sleep(policy.get_delay(attempt))
+            attempt += 1
+            self._rewind_files(kwargs)
+
+    def _rewind_files(self, kwargs):
+        """
+        重放请求前将上传的文件指针移回开头
+        """
+        for value in (kwargs.get("files") or {}).values():
+            fileobj = value[1] if isinstance(value, tuple) else value
+            if hasattr(fileobj, 'seek'):
+                fileobj.seek(0)
 
     def _get(self, url, **kwargs):
         """
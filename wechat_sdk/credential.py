@@ -0,0 +1,567 @@
+# -*- coding: utf-8 -*-
+
+import heapq
+import itertools
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+from .lib import FileLock, atomic_write
+from .ratelimit import quota_day
+
+
+logger = logging.getLogger(__name__)
+
+# 凭证名称
+ACCESS_TOKEN = 'access_token'
+JSAPI_TICKET = 'jsapi_ticket'
+
+_snapshots = {}
+_refresh_states_guard = threading.Lock()
+
+
+class RefreshState(object):
+    """
+    同一凭证的刷新状态: 刷新锁、最近一次获取到的值及当日获取次数, 使用同一个 RefreshStateRegistry 且 appid 相同的实例共享
+    """
+    __slots__ = ('lock', 'value', 'expires_at', 'day', 'grants')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = None
+        self.expires_at = None
+        self.day = None
+        self.grants = 0
+
+    def record_grant(self):
+        """
+        记录一次成功获取凭证的调用
+        """
+        day = quota_day()
+        with _refresh_states_guard:
+            if day != self.day:
+                self.day, self.grants = day, 0
+            self.grants += 1
+
+    def get_grants(self):
+        """
+        获取当日 (北京时间) 成功获取凭证的次数
+        """
+        with _refresh_states_guard:
+            return self.grants if self.day == quota_day() else 0
+
+
+class RefreshStateRegistry(object):
+    """
+    按凭证的完整名称保存的一组刷新状态
+
+    WechatBasic 默认使用进程内共享的 default_refresh_states, 同一进程中 appid 相同的实例共享刷新锁及最近一次获取到的值;
+    WechatManager 为其托管的公众号使用独立的集合, 不与管理器之外 appid 相同 (可能使用不同的 appsecret 或凭证存储) 的实例共享
+    """
+    def __init__(self):
+        self._states = {}
+
+    def get(self, name):
+        """
+        获取凭证的刷新状态, 不存在时创建
+        :param name: 凭证的完整名称, 格式为 '<appid>.<凭证名称>'
+        :return: RefreshState 对象
+        """
+        with _refresh_states_guard:
+            state = self._states.get(name)
+            if state is None:
+                state = self._states[name] = RefreshState()
+            return state
+
+    def discard(self, name):
+        """
+        丢弃凭证的刷新状态 (如公众号的配置已被替换)
+        :param name: 凭证的完整名称
+        """
+        with _refresh_states_guard:
+            self._states.pop(name, None)
+
+
+default_refresh_states = RefreshStateRegistry()
+
+
+def get_refresh_state(name):
+    """
+    获取进程内共享的凭证刷新状态
+    :param name: 凭证的完整名称, 格式为 '<appid>.<凭证名称>'
+    :return: RefreshState 对象
+    """
+    return default_refresh_states.get(name)
+
+
+def get_snapshot(path):
+    """
+    获取进程内共享的凭证快照文件
+    :param path: 快照文件路径
+    :return: CredentialSnapshot 对象
+    """
+    path = os.path.abspath(path)
+    with _refresh_states_guard:
+        snapshot = _snapshots.get(path)
+        if snapshot is None:
+            snapshot = _snapshots[path] = CredentialSnapshot(path)
+        return snapshot
+
+
+def credential_key(appid, name):
+    """
+    获取凭证在锁及存储中使用的名称
+    :param appid: App ID
+    :param name: 凭证名称, ACCESS_TOKEN 或 JSAPI_TICKET
+    """
+    return '{}.{}'.format(appid, name)
+
+
+class FileLockFactory(object):
+    """
+    为每个凭证创建基于文件锁的跨进程刷新锁, 可作为 WechatBasic 的 lock_factory 参数, 仅支持 POSIX 系统
+    """
+    def __init__(self, directory):
+        """
+        :param directory: 锁文件所在目录, 同一台机器上的各进程需使用相同的目录
+        """
+        self.directory = directory
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def __call__(self, name):
+        """
+        :param name: 锁名称, 格式为 '<appid>.<凭证名称>'
+        :return: wechat_sdk.lib.FileLock 对象
+        """
+        with self._guard:
+            lock = self._locks.get(name)
+            if lock is None:
+                path = os.path.join(self.directory, 'wechat-{}.lock'.format(name))
+                lock = self._locks[name] = FileLock(path)
+            return lock
+
+
+class CredentialSnapshot(object):
+    """
+    保存在磁盘上的凭证快照, 新建的实例 (如重启后的进程) 从中读取仍然有效的凭证, 无需请求微信服务器, 仅支持 POSIX 系统
+
+    写入时持有文件锁, 将完整内容写入同目录下的临时文件后通过 rename 原子地替换快照文件, 读取时不需要加锁
+    """
+    def __init__(self, path):
+        """
+        :param path: 快照文件路径, 同目录下会创建 path + '.lock' 锁文件
+        """
+        self.path = path
+        self._lock = FileLock(path + '.lock')
+
+    def load(self):
+        """
+        读取快照, 文件不存在、内容无法解析或不是 JSON 对象时返回空 dict, 格式不正确的条目会被忽略
+        :return: 凭证名称 -> (值, 过期时间戳) 的 dict
+        """
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return dict((key, tuple(item)) for key, item in data.items() if isinstance(item, list) and len(item) == 2)
+
+    def get(self, key):
+        """
+        读取凭证
+        :param key: 凭证名称
+        :return: (值, 过期时间戳) tuple, 不存在时返回 None
+        """
+        return self.load().get(key)
+
+    def save(self, key, value, expires_at):
+        """
+        保存凭证, 同时删除快照中已过期的凭证
+        :param key: 凭证名称
+        :param value: 凭证值
+        :param expires_at: 过期时间戳
+        """
+        with self._lock:
+            now = time.time()
+            data = dict((k, list(v)) for k, v in self.load().items() if v[1] > now)
+            data[key] = [value, expires_at]
+            atomic_write(self.path, json.dumps(data))
+
+
+class BaseTokenStore(object):
+    """
+    凭证存储基类, 多个 WechatBasic 实例 (可以位于不同进程或不同主机) 通过共享的凭证存储使用同一个 access_token 及 jsapi_ticket
+
+    子类需实现 get, set 及 delete 方法, 凭证名称格式为 '<appid>.<凭证名称>'
+    """
+    def get(self, key):
+        """
+        读取凭证
+        :param key: 凭证名称
+        :return: (值, 过期时间戳) tuple, 不存在时返回 None
+        """
+        raise NotImplementedError()
+
+    def set(self, key, value, expires_at):
+        """
+        保存凭证
+        :param key: 凭证名称
+        :param value: 凭证值
+        :param expires_at: 过期时间戳
+        """
+        raise NotImplementedError()
+
+    def delete(self, key):
+        """
+        删除凭证
+        :param key: 凭证名称
+        """
+        raise NotImplementedError()
+
+
+class MemoryTokenStore(BaseTokenStore):
+    """
+    保存在当前进程内存中的凭证, 同一进程中的多个实例传入同一个 MemoryTokenStore 即可共享凭证
+    """
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key)
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._data[key] = (value, expires_at)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class FileTokenStore(BaseTokenStore):
+    """
+    保存在文件中的凭证, 可在同一台机器的多个进程之间共享, 仅支持 POSIX 系统
+
+    文件通过 mmap 映射到内存, 以版本号开头: 写入时持有文件锁并递增版本号, 读取时只比较版本号,
+    未变化时直接使用上次解析的结果, 不进行系统调用及 JSON 解析
+    """
+    header = struct.Struct('<QI')  # 版本号, 数据长度
+
+    def __init__(self, path, size=4096):
+        """
+        :param path: 凭证文件路径, 不存在时以 0600 权限创建, 同目录下会创建 path + '.lock' 锁文件
+        :param size: 凭证文件的初始大小 (字节), 数据超出时自动扩大
+        """
+        self.path = path
+        self.size = max(size, self.header.size)
+        self._lock = FileLock(path + '.lock')
+        self._guard = threading.Lock()
+        self._fd = None
+        self._mmap = None
+        self._version = None
+        self._data = {}
+
+    def get(self, key):
+        with self._guard:
+            if self._mmap is None:
+                with self._lock:
+                    self._open()
+            version, length = self.header.unpack_from(self._mmap, 0)
+            if version != self._version:
+                with self._lock:
+                    self._load()
+            item = self._data.get(key)
+        return tuple(item) if item is not None else None
+
+    def set(self, key, value, expires_at):
+        self._update(key, [value, expires_at])
+
+    def delete(self, key):
+        self._update(key, None)
+
+    def close(self):
+        """
+        关闭凭证文件
+        """
+        with self._guard:
+            if self._mmap is not None:
+                self._mmap.close()
+                os.close(self._fd)
+                self._mmap = self._fd = self._version = None
+
+    def _update(self, key, item):
+        with self._guard, self._lock:
+            if self._mmap is None:
+                self._open()
+            self._load()
+            now = time.time()
+            data = dict((k, v) for k, v in self._data.items() if v[1] > now)
+            if item is None:
+                data.pop(key, None)
+            else:
+                data[key] = item
+            payload = json.dumps(data).encode('utf-8')
+            if self.header.size + len(payload) > len(self._mmap):
+                self._remap(max(self.header.size + len(payload), len(self._mmap) * 2))
+            # 先写入数据再更新版本号, 读取方看到新版本号时数据已经完整
+            self._mmap[self.header.size:self.header.size + len(payload)] = payload
+            self.header.pack_into(self._mmap, 0, self._version + 1, len(payload))
+            self._version += 1
+            self._data = data
+
+    def _open(self):
+        """
+        打开并映射凭证文件, 调用时需持有文件锁
+        """
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            size = os.fstat(fd).st_size
+            if size < self.size:
+                os.ftruncate(fd, self.size)
+                size = self.size
+            self._mmap = mmap.mmap(fd, size)
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def _remap(self, size=0):
+        """
+        重新映射凭证文件, size 大于文件大小时先扩大文件, 调用时需持有文件锁
+        """
+        if size > os.fstat(self._fd).st_size:
+            os.ftruncate(self._fd, size)
+        self._mmap.close()
+        self._mmap = mmap.mmap(self._fd, os.fstat(self._fd).st_size)
+
+    def _load(self):
+        """
+        重新解析凭证文件, 调用时需持有文件锁
+        """
+        if os.fstat(self._fd).st_size != len(self._mmap):
+            # 其他进程扩大了凭证文件
+            self._remap()
+        version, length = self.header.unpack_from(self._mmap, 0)
+        if version == self._version:
+            return
+        payload = self._mmap[self.header.size:self.header.size + length]
+        self._data = json.loads(payload.decode('utf-8')) if length else {}
+        self._version = version
+
+
+class KVTokenStore(BaseTokenStore):
+    """
+    保存在外部键值存储中的凭证, 可在多台主机之间共享
+
+    client 需提供 get(key), set(key, value, timeout) 及 delete(key) 方法, 如 redis.StrictRedis 实例或 Django 的缓存对象
+    (django.core.cache.cache). 凭证以 JSON 字符串保存, 并在过期时由键值存储自动删除
+    """
+    def __init__(self, client, prefix='wechat:'):
+        """
+        :param client: 键值存储客户端
+        :param prefix: 键名前缀
+        """
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        content = self.client.get(self.prefix + key)
+        if content is None:
+            return None
+        if isinstance(content, bytes):
+            content = content.decode('utf-8')
+        value, expires_at = json.loads(content)
+        return value, expires_at
+
+    def set(self, key, value, expires_at):
+        timeout = int(expires_at - time.time())
+        if timeout <= 0:
+            self.delete(key)
+            return
+        self.client.set(self.prefix + key, json.dumps([value, expires_at]), timeout)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+class _RefreshEntry(object):
+    """
+    TokenRefresher 中一个实例的一个凭证
+    """
+    __slots__ = ('wechat', 'name', 'due', 'lifetime', 'failures', 'last_error', 'refreshed_at', 'cancelled')
+
+    def __init__(self, wechat, name):
+        self.wechat = wechat
+        self.name = name
+        self.due = None
+        self.lifetime = 0
+        self.failures = 0
+        self.last_error = None
+        self.refreshed_at = None
+        self.cancelled = False
+
+
+class TokenRefresher(object):
+    """
+    后台刷新 access_token 及 jsapi_ticket
+
+    在凭证有效期过去 ratio 时, 于后台线程中通过 WechatBasic 的单飞刷新重新获取凭证 (已被其他实例或进程刷新时直接使用新的值),
+    失败时按指数退避重试. 请求路径只会读到已经预热的凭证, 不会等待刷新. 一个 TokenRefresher 使用一个线程及一个按到期时间排序的堆,
+    可以同时管理多个公众号的凭证. 仅支持同步的 WechatBasic, AsyncWechatBasic 可通过共享的 token_store 使用其刷新结果
+    """
+    def __init__(self, ratio=0.8, backoff=1.0, max_backoff=60.0, on_error=None):
+        """
+        :param ratio: 凭证有效期过去多少比例时刷新, 0 ~ 1
+        :param backoff: 刷新失败后第一次重试前的等待时间 (秒), 之后每次翻倍
+        :param max_backoff: 重试等待时间上限 (秒)
+        :param on_error: 刷新失败时的回调函数, 参数为 (WechatBasic 实例, 凭证名称, 异常), 回调抛出的异常会被记录到日志并忽略
+        """
+        self.ratio = ratio
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.on_error = on_error
+        self._entries = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def add(self, wechat, credentials=(ACCESS_TOKEN, JSAPI_TICKET)):
+        """
+        开始在后台刷新 wechat 的凭证, 本地没有有效凭证时立即刷新, 后台线程未启动时自动启动
+        :param wechat: WechatBasic 实例
+        :param credentials: 需要刷新的凭证名称
+        """
+        with self._condition:
+            for name in credentials:
+                key = (id(wechat), name)
+                if key in self._entries:
+                    continue
+                entry = self._entries[key] = _RefreshEntry(wechat, name)
+                self._schedule(entry, self._get_due(entry, time.time()))
+            self._condition.notify()
+        self.start()
+
+    def remove(self, wechat, credentials=(ACCESS_TOKEN, JSAPI_TICKET)):
+        """
+        停止在后台刷新 wechat 的凭证
+        :param wechat: WechatBasic 实例
+        :param credentials: 不再刷新的凭证名称
+        """
+        with self._condition:
+            for name in credentials:
+                entry = self._entries.pop((id(wechat), name), None)
+                if entry is not None:
+                    entry.cancelled = True
+
+    def start(self):
+        """
+        启动后台线程
+        """
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name='wechat-token-refresher')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        停止后台线程, 正在进行的刷新完成后退出
+        :param timeout: 等待线程退出的最长时间 (秒)
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def get_status(self):
+        """
+        获取所有凭证的刷新状态
+        :return: list 对象, 每个元素为包含 appid, name, due (下次刷新时间戳), refreshed_at, failures 及 last_error 的 dict
+        """
+        with self._condition:
+            entries = sorted(self._entries.values(), key=lambda entry: entry.due)
+            return [{
+                'appid': entry.wechat.appid,
+                'name': entry.name,
+                'due': entry.due,
+                'refreshed_at': entry.refreshed_at,
+                'failures': entry.failures,
+                'last_error': entry.last_error,
+            } for entry in entries]
+
+    def _schedule(self, entry, due):
+        entry.due = due
+        heapq.heappush(self._heap, (due, next(self._counter), entry))
+
+    def _get_due(self, entry, now):
+        """
+        根据本地缓存的凭证计算下次刷新时间, 没有有效凭证时返回 now
+        """
+        item = entry.wechat._get_cached_credential(entry.name)
+        if item is None or item[1] - now <= 60:
+            return now
+        # 观察到的最长剩余有效期即为凭证的有效期
+        entry.lifetime = max(entry.lifetime, item[1] - now)
+        # 至少在请求路径认为凭证即将过期 (剩余 60 秒) 之前 60 秒刷新, 避免请求等待
+        return min(item[1] - 120, item[1] - (1 - self.ratio) * entry.lifetime)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopped:
+                        return
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                    now = time.time()
+                    if self._heap and self._heap[0][0] <= now:
+                        entry = heapq.heappop(self._heap)[2]
+                        break
+                    self._condition.wait(self._heap[0][0] - now if self._heap else None)
+            due = self._refresh(entry)
+            with self._condition:
+                if not entry.cancelled:
+                    self._schedule(entry, due)
+
+    def _refresh(self, entry):
+        """
+        刷新一个凭证
+        :return: 下次刷新时间戳
+        """
+        now = time.time()
+        due = self._get_due(entry, now)
+        if due > now:
+            # 凭证已经在请求路径或其他线程中刷新, 只需重新安排
+            return due
+        item = entry.wechat._get_cached_credential(entry.name)
+        try:
+            entry.wechat._refresh_credential(entry.name, item[0] if item is not None else None)
+        except Exception as e:
+            entry.failures += 1
+            entry.last_error = e
+            if self.on_error is not None:
+                try:
+                    self.on_error(entry.wechat, entry.name, e)
+                except Exception:
+                    # 回调中的异常不能结束刷新线程, 否则所有凭证都将停止刷新
+                    logger.exception('on_error callback failed for %s.%s', entry.wechat.appid, entry.name)
+            return time.time() + min(self.max_backoff, self.backoff * (2 ** (entry.failures - 1)))
+        entry.failures = 0
+        entry.last_error = None
+        entry.refreshed_at = now = time.time()
+        return max(self._get_due(entry, now), now + 1)
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import re
+import threading
+
+from .messages import (MESSAGE_TYPES, UnknownMessage, COMPACT_MESSAGE_TYPES, CompactUnknownMessage,
+                       LAZY_MESSAGE_TYPES)
+from .exceptions import ParseError
+from .lib import XMLStore
+
+# 原始数据保留策略
+RAW_KEEP = 'keep'  # 在消息对象的 raw 属性中保留原始数据 (bytes)
+RAW_DROP = 'drop'  # 不保留原始数据, 消息对象的 raw 属性为 None
+
+
+class MessageDecoder(object):
+    """
+    微信服务器推送数据解码器
+
+    绝大多数推送数据均为 ``<xml>`` 下仅包含一层 CDATA 或文本子节点的扁平结构, 且消息类型已在 ``MESSAGE_TYPES`` 中注册,
+    对于此类数据直接从字节串中提取各字段并构造对应的消息对象 (快速路径);
+    仅当数据结构不符合预期时才回退到通用的 :class:`XMLStore` 解析方式
+    """
+    FLAT_BODY = re.compile(br'\s*<xml>(.*)</xml>\s*$', re.S)
+    # CDATA 内容部分不允许出现 ']]>', 以免将被拆分的多个 CDATA 段误识别为一个
+    FLAT_FIELD = re.compile(br'\s*<(\w+)>(?:<!\[CDATA\[([^\]]*(?:\](?!\]>)[^\]]*)*)\]\]>|([^<&]*))</\1>')
+    TRAILING_SPACE = re.compile(br'\s*$')
+
+    def __init__(self, compact=False, lazy=False, raw=RAW_KEEP):
+        """
+        :param compact: 是否构造使用 __slots__ 的紧凑消息类 (CompactWechatMessage 的子类), 默认为 False
+        :param lazy: 是否构造惰性消息类 (LazyWechatMessage 的子类), 默认为 False. 开启后快速路径只记录各字段的位置,
+                     属性在首次访问时才解码并转换类型; 回退路径仍构造普通的 WechatMessage 对象
+        :param raw: 消息对象 raw 属性的保留策略, 可选 RAW_KEEP (保留原始数据, 默认) 及 RAW_DROP (不保留, raw 为 None).
+                    惰性模式需要依赖原始数据解码, 不能与 RAW_DROP 同时使用
+        """
+        if compact and lazy:
+            raise ValueError('Parameters compact and lazy can not be enabled at the same time.')
+        if raw not in (RAW_KEEP, RAW_DROP):
+            raise ValueError('Parameter raw must be one of RAW_KEEP and RAW_DROP.')
+        if lazy and raw == RAW_DROP:
+            raise ValueError('Parameter raw can not be RAW_DROP when lazy is enabled.')
+
+        if compact:
+            self._message_types = COMPACT_MESSAGE_TYPES
+            self._unknown_message = CompactUnknownMessage
+        else:
+            self._message_types = MESSAGE_TYPES
+            self._unknown_message = UnknownMessage
+        self._lazy = lazy
+        self._raw = raw
+
+        self.hits = 0
+        self.fallbacks = 0
+
+    @property
+    def stats(self):
+        """
+        快速路径命中及回退次数统计 (多线程下为近似值)
+        :return: dict 对象, key 包括 `hit` 及 `fallback`
+        """
+        return {
+            'hit': self.hits,
+            'fallback': self.fallbacks,
+        }
+
+    def reset_stats(self):
+        """
+        清空命中及回退次数统计
+        """
+        self.hits = 0
+        self.fallbacks = 0
+
+    def decode(self, data):
+        """
+        解析微信服务器发送过来的数据
+        :param data: HTTP Request 的 Body 数据 (bytes)
+        :return: 解析好的消息对象
+        :raises ParseError: 解析微信服务器数据错误, 数据不合法
+        """
+        spans = self._scan_flat(data)
+        message_type = None
+        if spans is not None and 'MsgType' in spans:
+            start, end = spans['MsgType']
+            try:
+                message_type = data[start:end].decode('utf-8').lower()
+            except UnicodeDecodeError:
+                message_type = None
+
+        if self._lazy and message_type in LAZY_MESSAGE_TYPES:
+            self.hits += 1
+            return LAZY_MESSAGE_TYPES[message_type](data, spans, message_type, self._retain(data))
+
+        result = None
+        if message_type in self._message_types:
+            result = self._decode_spans(data, spans)
+        if result is None:
+            self.fallbacks += 1
+            try:
+                xml = XMLStore(xmlstring=data)
+            except Exception:
+                raise ParseError()
+            result = xml.xml2dict
+        else:
+            self.hits += 1
+
+        result['raw'] = self._retain(data)
+        result['type'] = result.pop('MsgType').lower()
+
+        message_type = self._message_types.get(result['type'], self._unknown_message)
+        return message_type(result)
+
+    def decode_many(self, payloads, processes=None, chunksize=256, ordered=True):
+        """
+        批量解析微信服务器发送过来的数据, 以生成器的方式逐条返回解析结果
+        :param payloads: 可迭代对象, 每个元素为一条 HTTP Request 的 Body 数据 (str 或 bytes)
+        :param processes: 进程池大小, 默认为 None 表示在当前进程中逐条解析; 传入整数时将数据按 chunksize 分块后分发到进程池中解析,
+                          同一时刻最多有 processes * 2 个数据块在处理中, 以免一次性读入全部数据. 子进程中的快速路径命中统计不会计入当前解码器
+        :param chunksize: 分发到进程池时每个数据块包含的数据条数
+        :param ordered: 使用进程池时是否保持与输入一致的顺序 (默认为 True), 为 False 时先解析完成的数据块先返回
+        :return: 生成器, 每个元素为解析好的消息对象
+        :raises ParseError: 解析微信服务器数据错误, 数据不合法
+        """
+        if not processes:
+            return (self.decode(to_bytes(data)) for data in payloads)
+        return self._decode_in_pool(payloads, processes, chunksize, ordered)
+
+    def _decode_in_pool(self, payloads, processes, chunksize, ordered):
+        pool = multiprocessing.Pool(processes, _init_worker, (self, ))
+        # 进程池在后台线程中读取数据块, 每取出一个解析结果才允许再分发一个数据块
+        slots = threading.Semaphore(processes * 2)
+        closed = []
+
+        def chunks():
+            for chunk in _chunked(payloads, chunksize):
+                slots.acquire()
+                if closed:
+                    return
+                yield chunk
+
+        imap = pool.imap if ordered else pool.imap_unordered
+        try:
+            for messages in imap(_decode_chunk, chunks()):
+                slots.release()
+                for message in messages:
+                    yield message
+            pool.close()
+            pool.join()
+        finally:
+            closed.append(True)
+            slots.release()  # 唤醒可能正在等待的后台线程, 使其退出
+            pool.terminate()
+
+    def _retain(self, data):
+        """
+        按照保留策略生成消息对象的 raw 属性值
+        """
+        if self._raw == RAW_KEEP:
+            return data
+        return None
+
+    def _scan_flat(self, data):
+        """
+        快速路径: 扫描扁平结构的字节串, 仅记录各字段值的位置, 不进行解码
+        :param data: HTTP Request 的 Body 数据 (bytes)
+        :return: dict 对象, key 为节点名, value 为 (start, end) 形式的字段值位置, 字段与 XMLStore.xml2dict 一致;
+                 数据结构不符合预期时返回 None
+        """
+        body = self.FLAT_BODY.match(data)
+        if not body or b'\r' in data:
+            return None  # 含有 '\r' 时需按 XML 规范进行换行符归一化, 交由 XMLStore 处理
+
+        spans = {}
+        pos, end = body.span(1)
+        for field in self.FLAT_FIELD.finditer(data, pos, end):
+            if field.start() != pos:
+                return None
+            pos = field.end()
+
+            start, stop = field.span(2)
+            if start != -1:
+                if start == stop:
+                    continue  # 与 XMLStore 一致: 忽略空 CDATA 段
+            else:
+                start, stop = field.span(3)
+                if not data[start:stop].strip():
+                    continue  # 与 XMLStore 一致: 忽略空白文本节点
+            spans[field.group(1).decode('ascii')] = (start, stop)
+
+        if pos != end and not self.TRAILING_SPACE.match(data, pos, end):
+            return None
+        return spans
+
+    def _decode_spans(self, data, spans):
+        """
+        将 :func:`_scan_flat` 记录的全部字段解码为 dict
+        :return: 与 XMLStore.xml2dict 一致的 dict; 数据无法按 UTF-8 解码时返回 None
+        """
+        try:
+            return dict((name, data[start:end].decode('utf-8')) for name, (start, end) in spans.items())
+        except UnicodeDecodeError:
+            return None
+
+
+def to_bytes(data):
+    """
+    将推送数据转换为 bytes: str 按 UTF-8 编码, bytes 保持不变
+    :param data: HTTP Request 的 Body 数据
+    :raises ParseError: 其他类型视为数据不合法
+    """
+    if type(data) == str:
+        return data.encode('utf-8')
+    elif type(data) == bytes:
+        return data
+    raise ParseError()
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+_worker_decoder = None
+
+
+def _init_worker(decoder):
+    global _worker_decoder
+    _worker_decoder = decoder
+
+
+def _decode_chunk(chunk):
+    return [_worker_decoder.decode(to_bytes(data)) for data in chunk]
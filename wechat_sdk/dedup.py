@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+from .lib import LRUCache
+
+
+class BaseDedupStore(object):
+    """
+    消息去重存储接口
+
+    自定义存储 (如多个工作进程共享的缓存) 需要实现以下方法, 其中 add 必须是原子操作
+    """
+    def get(self, key):
+        """
+        :return: 缓存值, 不存在或已过期时返回 None
+        """
+        raise NotImplementedError()
+
+    def add(self, key, value, ttl):
+        """
+        仅当 key 不存在时设置缓存值
+        :return: 设置成功返回 True, key 已存在返回 False
+        """
+        raise NotImplementedError()
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError()
+
+    def delete(self, key):
+        raise NotImplementedError()
+
+
+class MemoryDedupStore(BaseDedupStore):
+    """
+    进程内的 LRU 去重存储 (默认)
+    """
+    def __init__(self, max_entries=10000):
+        """
+        :param max_entries: 最多保存的消息条数, 超出后淘汰最久未使用的条目
+        """
+        self._cache = LRUCache(max_entries=max_entries)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def add(self, key, value, ttl):
+        return self._cache.add(key, value, ttl)
+
+    def set(self, key, value, ttl):
+        self._cache.set(key, value, ttl)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+
+class CacheDedupStore(BaseDedupStore):
+    """
+    基于外部缓存的去重存储, 可在多个工作进程 / 主机间共享
+
+    cache 需要提供与 Django cache 一致的 get(key), add(key, value, timeout), set(key, value, timeout), delete(key) 方法
+    """
+    def __init__(self, cache, prefix='wechat_sdk:dedup:'):
+        """
+        :param cache: 缓存对象, 如 django.core.cache.cache
+        :param prefix: 缓存键前缀
+        """
+        self._cache = cache
+        self._prefix = prefix
+
+    def get(self, key):
+        return self._cache.get(self._prefix + key)
+
+    def add(self, key, value, ttl):
+        return self._cache.add(self._prefix + key, value, ttl)
+
+    def set(self, key, value, ttl):
+        self._cache.set(self._prefix + key, value, ttl)
+
+    def delete(self, key):
+        self._cache.delete(self._prefix + key)
+
+
+class MessageDeduplicator(object):
+    """
+    消息去重器
+
+    微信服务器在响应超时时会对同一条消息重试推送 (最多三次). 去重器以 MsgId (事件消息以 FromUserName + CreateTime + 事件类型)
+    标识消息, 只有首次推送会调用处理函数, 其后的重试直接返回首次处理得到的响应数据.
+    可以传给 WechatBasic(dedup=...) 由 handle_message 使用, 也可以作为装饰器使用 ::
+
+        dedup = MessageDeduplicator()
+
+        @dedup
+        def handle(message):
+            return wechat.reply_text(message, expensive_work(message))
+
+        response = handle(wechat.parse_message(body))
+    """
+    PENDING = '__wechat_sdk_dedup_pending__'
+
+    def __init__(self, store=None, ttl=60, wait=0.5, poll_interval=0.05):
+        """
+        :param store: 去重存储, 为 BaseDedupStore 的子类实例, 默认为进程内的 MemoryDedupStore
+        :param ttl: 已处理消息的保存时间 (秒), 需覆盖微信服务器的重试时间范围
+        :param wait: 重试到达时首次推送仍在处理中, 最多等待其处理完成的时间 (秒), 超时返回空字符串.
+                     等待期间按 poll_interval 轮询, 会阻塞处理重试推送的工作线程; 重试通常发生在响应缓慢时,
+                     等待过久会占满工作线程, 因此默认只等待 0.5 秒. 首次推送的连接已被微信服务器断开,
+                     其结果只能通过重试的响应返回给用户, 等待超时时首次处理的结果不会送达用户 (可改用客服消息接口发送)
+        :param poll_interval: 等待首次推送处理完成时的轮询间隔 (秒)
+        """
+        self._store = store or MemoryDedupStore()
+        self._ttl = ttl
+        self._wait = wait
+        self._poll_interval = poll_interval
+
+    def __call__(self, handler):
+        def wrapper(message):
+            return self.handle(message, handler)
+        wrapper.__name__ = getattr(handler, '__name__', 'wrapper')
+        wrapper.__doc__ = getattr(handler, '__doc__', None)
+        return wrapper
+
+    def get_key(self, message):
+        """
+        生成消息的去重键
+        :param message: 消息对象
+        """
+        if message.id:
+            return '{}:{}'.format(message.target, message.id)
+        return '{}:{}:{}:{}'.format(message.target, message.source, message.time, message.type)
+
+    def handle(self, message, handler):
+        """
+        对消息进行去重处理
+        :param message: 消息对象
+        :param handler: 处理函数, 接受消息对象作为参数, 返回响应数据
+        :return: 首次推送返回处理函数的返回值, 重试推送返回首次处理得到的响应数据 (首次推送仍在处理中时返回空字符串)
+        """
+        key = self.get_key(message)
+        while True:
+            if self._store.add(key, self.PENDING, self._ttl):
+                try:
+                    response = handler(message)
+                except Exception:
+                    self._store.delete(key)
+                    raise
+                self._store.set(key, '' if response is None else response, self._ttl)
+                return response
+
+            deadline = time.time() + self._wait
+            while True:
+                response = self._store.get(key)
+                if response is None:
+                    # 条目已过期或首次处理失败, 按首次推送重新处理
+                    break
+                if response != self.PENDING:
+                    return response
+                if time.time() >= deadline:
+                    return ''
+                time.sleep(self._poll_interval)
@@ -26,6 +26,28 @@ class OfficialAPIError(Exception):
     """
     微信官方API请求出错异常
     """
+    def __init__(self, message='', errcode=None, errmsg=None):
+        """
+        :param message: 异常信息
+        :param errcode: 微信服务器返回的错误码
+        :param errmsg: 微信服务器返回的错误信息
+        """
+        super(OfficialAPIError, self).__init__(message)
+        self.errcode = errcode
+        self.errmsg = errmsg
+
+
+class QuotaExceededError(OfficialAPIError):
+    """
+    微信官方API请求出错异常 - 接口当日调用次数已达上限
+    """
+    pass
+
+
+class RateLimitExceededError(OfficialAPIError):
+    """
+    微信官方API请求出错异常 - 接口调用频率超出限制且等待时间超过上限
+    """
     pass
 
 
@@ -2,7 +2,6 @@
 
 import hashlib
 import re
-import requests
 import json
 import random
 import time
@@ -10,6 +9,7 @@ from datetime import timedelta, date
 
 from .exceptions import UnOfficialAPIError, NeedLoginError, LoginError, LoginVerifyCodeError
 from .lib import disable_urllib3_warning
+from .transport import RequestsTransport
 
 
 class WechatExt(object):
@@ -19,7 +19,7 @@ class WechatExt(object):
     通过模拟登陆的方式实现更多的高级功能, 请注意使用本类有风险, 请自行承担
     """
     def __init__(self, username, password, token=None, cookies=None, appid=None, plugin_token=None, ifencodepwd=False,
-                 login=True, checkssl=False):
+                 login=True, checkssl=False, transport=None):
         """
         :param username: 你的微信公众平台账户用户名
         :param password: 你的微信公众平台账户密码
@@ -30,10 +30,13 @@ class WechatExt(object):
         :param ifencodepwd: 密码是否已经经过编码, 如果密码已经经过加密, 此处为 ``True`` , 如果传入的密码为明文, 此处为 ``False``
         :param login: 是否在初始化过程中尝试登录 (推荐此处设置为 ``False``, 然后手动执行登录以方便进行识别验证码等操作, 此处默认值为 ``True`` 为兼容历史版本
         :param checkssl: 是否检查 SSL, 默认为 False, 可避免 urllib3 的 InsecurePlatformWarning 警告
+        :param transport: 发送 HTTP 请求使用的传输层, wechat_sdk.transport.BaseTransport 实例, 如果不传入, 将会使用不保存 Cookie 的 requests.Session 发送请求
         """
         if not checkssl:
             disable_urllib3_warning()  # 可解决 InsecurePlatformWarning 警告
 
+        self.__transport = transport or RequestsTransport(store_cookies=False)
+
         self.__username = username
         if ifencodepwd:
             self.__password = password
@@ -79,7 +82,7 @@ class WechatExt(object):
             'referer': 'https://mp.weixin.qq.com/cgi-bin/loginpage?t=wxm2-login&lang=zh_CN',
             'Cookie': self.__cookies,
         }
-        r = requests.post(url, data=payload, headers=headers)
+        r = self.__transport.post(url, data=payload, headers=headers)
 
         s = re.search(r'token=(\d+)', r.text)
         if not s:
@@ -113,7 +116,7 @@ class WechatExt(object):
         headers = {
             'referer': 'https://mp.weixin.qq.com/',
         }
-        r = requests.get(url, data=payload, headers=headers, stream=True)
+        r = self.__transport.get(url, data=payload, headers=headers, stream=True)
 
         self.__cookies = ''
         for cookie in r.cookies:
@@ -185,7 +188,7 @@ class WechatExt(object):
             ),
             'cookie': self.__cookies,
         }
-        r = requests.post(url, data=payload, headers=headers)
+        r = self.__transport.post(url, data=payload, headers=headers)
 
         try:
             message = json.loads(r.text)
@@ -243,7 +246,7 @@ class WechatExt(object):
             ),
             'cookie': self.__cookies,
         }
-        r = requests.get(url, headers=headers)
+        r = self.__transport.get(url, headers=headers)
 
         try:
             message = json.loads(r.text)['contact_list']
@@ -346,7 +349,7 @@ class WechatExt(object):
             ),
             'cookie': self.__cookies,
         }
-        r = requests.get(url, headers=headers)
+        r = self.__transport.get(url, headers=headers)
 
         if not re.search(r'wechat_token', self.__cookies):
             for cookie in r.cookies:
@@ -401,7 +404,7 @@ class WechatExt(object):
             ),
             'cookie': self.__cookies,
         }
-        r = requests.get(url, headers=headers)
+        r = self.__transport.get(url, headers=headers)
 
         try:
             message = json.loads(r.text)['group_list']
@@ -521,7 +524,7 @@ class WechatExt(object):
             ),
             'cookie': self.__cookies,
         }
-        r = requests.get(url, headers=headers)
+        r = self.__transport.get(url, headers=headers)
 
         try:
             message = json.dumps(json.loads(r.text)['app_msg_info']['item'], ensure_ascii=False)
@@ -635,7 +638,7 @@ class WechatExt(object):
             'cookie': self.__cookies,
         }
 
-        r = requests.get(url, headers=headers)
+        r = self.__transport.get(url, headers=headers)
         try:
             message = json.dumps(json.loads(r.text)['page_info'], ensure_ascii=False)
         except (KeyError, ValueError):
@@ -671,7 +674,7 @@ class WechatExt(object):
             ),
             'cookie': self.__cookies,
         }
-        r = requests.post(url, data=payload, headers=headers)
+        r = self.__transport.post(url, data=payload, headers=headers)
 
         try:
             message = json.loads(r.text)
@@ -750,7 +753,7 @@ class WechatExt(object):
             payload['sourceurl'+str(i)] = item.get('from_url')
             i += 1
         payload['count'] = i
-        r = requests.post(url, data=payload, headers=headers)
+        r = self.__transport.post(url, data=payload, headers=headers)
 
         try:
             message = json.loads(r.text)
@@ -790,7 +793,7 @@ class WechatExt(object):
             'referer': 'http://mp.weixin.qq.com/cgi-bin/indexpage?t=wxm-upload&lang=zh_CN&type=2&formId=1',
             'cookie': self.__cookies,
         }
-        r = requests.post(url, files=files, data=payloads, headers=headers)
+        r = self.__transport.post(url, files=files, data=payloads, headers=headers)
 
         try:
             message = json.loads(r.text)
@@ -854,7 +857,7 @@ class WechatExt(object):
             'cookie': self.__cookies,
             'x-requested-with': 'XMLHttpRequest',
         }
-        r = requests.post(url, data=payloads, headers=headers)
+        r = self.__transport.post(url, data=payloads, headers=headers)
 
         try:
             message = json.loads(r.text)
@@ -923,7 +926,7 @@ class WechatExt(object):
             ),
             'cookie': self.__cookies,
         }
-        r = requests.get(url, headers=headers)
+        r = self.__transport.get(url, headers=headers)
 
         try:
             message = json.dumps(json.loads(r.text)['page_info'], ensure_ascii=False)
@@ -1001,7 +1004,7 @@ class WechatExt(object):
             ),
             'cookie': self.__cookies,
         }
-        r = requests.post(url, data=payloads, headers=headers)
+        r = self.__transport.post(url, data=payloads, headers=headers)
 
         try:
             message = json.dumps(json.loads(r.text)['contact_info'], ensure_ascii=False)
@@ -1028,7 +1031,7 @@ class WechatExt(object):
             ),
             'cookie': self.__cookies,
         }
-        r = requests.get(url, headers=headers, stream=True)
+        r = self.__transport.get(url, headers=headers, stream=True)
 
         return r.raw.data
 
@@ -1056,7 +1059,7 @@ class WechatExt(object):
             ),
             'cookie': self.__cookies,
         }
-        r = requests.get(url, data=payloads, headers=headers)
+        r = self.__transport.get(url, data=payloads, headers=headers)
 
         try:
             return int(json.loads(r.text)['newTotalMsgCount'])
@@ -1173,7 +1176,7 @@ class WechatExt(object):
             'referer': 'https://mp.weixin.qq.com/cgi-bin/message?t=message/list&count=20&day=7&token={token}&lang=zh_CN'.format(token=self.__token),
             'cookie': self.__cookies,
         }
-        r = requests.get(url, headers=headers)
+        r = self.__transport.get(url, headers=headers)
 
         try:
             message = json.loads(r.text)['msg_items']
@@ -1206,7 +1209,7 @@ class WechatExt(object):
             ),
             'cookie': self.__cookies,
         }
-        r = requests.get(url, headers=headers, stream=True)
+        r = self.__transport.get(url, headers=headers, stream=True)
 
         # 检测会话是否超时
         if r.headers.get('content-type', None) == 'text/html; charset=UTF-8':
@@ -1236,7 +1239,7 @@ class WechatExt(object):
             ),
             'cookie': self.__cookies,
         }
-        r = requests.get(url, headers=headers, stream=True)
+        r = self.__transport.get(url, headers=headers, stream=True)
 
         # 检测会话是否超时
         if r.headers.get('content-type', None) == 'text/html; charset=UTF-8':
@@ -1266,7 +1269,7 @@ class WechatExt(object):
             ),
             'cookie': self.__cookies,
         }
-        r = requests.get(url, headers=headers, stream=True)
+        r = self.__transport.get(url, headers=headers, stream=True)
 
         # 检测会话是否超时
         if r.headers.get('content-type', None) == 'text/html; charset=UTF-8':
@@ -1304,7 +1307,7 @@ class WechatExt(object):
             'referer': 'https://mp.weixin.qq.com',
             'cookie': self.__cookies,
         }
-        r = requests.get(url, headers=headers)
+        r = self.__transport.get(url, headers=headers)
 
         # 获取 Ticket ID 值
         ticket_id = re.search(r'user_name:\"(.*)\"', r.text)
@@ -1356,7 +1359,7 @@ class WechatExt(object):
                 ),
                 'cookie': self.__cookies,
             }
-            r = requests.get(url, headers=headers)
+            r = self.__transport.get(url, headers=headers)
 
             plugin_token = re.search(r"pluginToken : '(\S+)',", r.text)
             if not plugin_token:
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+import binascii
+import hashlib
+import json
+import os
+import time
+
+from .exceptions import NeedParamError
+
+
+# 签名字符串, 参数已按字段名的 ASCII 码从小到大排序
+SIGNATURE_FORMAT = u'jsapi_ticket={}&noncestr={}&timestamp={}&url={}'
+
+
+def sign_jsapi(jsapi_ticket, noncestr, timestamp, url):
+    """
+    计算 JS-SDK 权限验证签名
+    详情请参考 http://mp.weixin.qq.com/wiki/7/aaa137b55fb2e0456bf8dd9148dd613f.html#.E9.99.84.E5.BD.951-JS-SDK.E4.BD.BF.E7.94.A8.E6.9D.83.E9.99.90.E7.AD.BE.E5.90.8D.E7.AE.97.E6.B3.95
+    :param jsapi_ticket: jsapi_ticket 值
+    :param noncestr: 随机数
+    :param timestamp: 时间戳
+    :param url: 要签名的 url，不包含 # 及其后面部分
+    :return: sha1 签名的 hexdigest 值
+    """
+    return hashlib.sha1(SIGNATURE_FORMAT.format(jsapi_ticket, noncestr, timestamp, url).encode('utf-8')).hexdigest()
+
+
+def generate_noncestr():
+    """
+    生成 16 位的随机字符串
+    """
+    return binascii.hexlify(os.urandom(8)).decode('ascii')
+
+
+class JsapiConfig(object):
+    """
+    生成 JS-SDK 页面使用的 wx.config 配置
+
+    同一时间段 (bucket 秒) 内的所有配置使用相同的时间戳及随机数, 签名按时间段缓存 (时间段结束时整体丢弃), 键为 (jsapi_ticket, url),
+    同一页面在同一时间段内的重复访问不需要计算签名, 其他情况只计算一次 sha1. jsapi_ticket 更新后旧的签名自动失效.
+    显式传入时间戳或随机数时不使用缓存
+    """
+    def __init__(self, wechat, js_api_list=(), debug=False, bucket=300, max_entries=10000, noncestr_factory=None):
+        """
+        :param wechat: WechatBasic 实例, 使用其 appid 及 jsapi_ticket. 使用 AsyncWechatBasic 时需先 await ensure_jsapi_ticket()
+        :param js_api_list: 默认的 jsApiList, 需要使用的 JS 接口列表
+        :param debug: 默认是否开启调试模式
+        :param bucket: 时间戳及随机数的更新间隔 (秒)
+        :param max_entries: 每个时间段缓存的签名数量上限
+        :param noncestr_factory: 生成随机数的函数, 默认为 generate_noncestr
+        """
+        self.wechat = wechat
+        self.js_api_list = list(js_api_list)
+        self.debug = debug
+        self.bucket = bucket
+        self.max_entries = max_entries
+        self.noncestr_factory = noncestr_factory or generate_noncestr
+        self._current = (None, None, {})  # (时间戳, 随机数, (jsapi_ticket, url) -> 签名)
+
+    def get_signature(self, url, timestamp=None, noncestr=None):
+        """
+        获取 url 的签名
+        :param url: 页面 url, # 及其后面部分会被忽略
+        :param timestamp: 时间戳, 默认使用当前时间段的时间戳
+        :param noncestr: 随机数, 默认使用当前时间段的随机数
+        :return: (时间戳, 随机数, 签名) tuple
+        """
+        return self._sign(self._get_jsapi_ticket(), url, timestamp, noncestr)
+
+    def get_config(self, url, js_api_list=None, debug=None, timestamp=None, noncestr=None):
+        """
+        获取 wx.config 的参数
+        :param url: 页面 url, # 及其后面部分会被忽略
+        :param js_api_list: 需要使用的 JS 接口列表, 默认使用构造时传入的值
+        :param debug: 是否开启调试模式, 默认使用构造时传入的值
+        :param timestamp: 时间戳, 默认使用当前时间段的时间戳
+        :param noncestr: 随机数, 默认使用当前时间段的随机数
+        :return: dict 对象, 包括 debug, appId, timestamp, nonceStr, signature 及 jsApiList
+        """
+        return self._build(self._get_jsapi_ticket(), url, js_api_list, debug, timestamp, noncestr)
+
+    def get_configs(self, urls, js_api_list=None, debug=None, timestamp=None, noncestr=None):
+        """
+        批量获取多个页面的 wx.config 参数, 只读取一次 jsapi_ticket, 各页面使用相同的时间戳及随机数
+        :param urls: 页面 url 列表
+        :return: 与 urls 顺序相同的 list 对象, 元素同 get_config 的返回值
+        """
+        jsapi_ticket = self._get_jsapi_ticket()
+        if timestamp is None and noncestr is None:
+            # 在同一个时间段内生成, 避免批量生成过程中跨越时间段
+            timestamp, noncestr, signatures = self._get_current()
+            return [self._build(jsapi_ticket, url, js_api_list, debug, timestamp, noncestr, signatures) for url in urls]
+        return [self._build(jsapi_ticket, url, js_api_list, debug, timestamp, noncestr) for url in urls]
+
+    def get_config_json(self, url, **kwargs):
+        """
+        获取可以直接嵌入页面的 wx.config 参数 JSON 字符串, 如 ``wx.config({{ config_json }});``
+        参数同 get_config
+        """
+        return json.dumps(self.get_config(url, **kwargs), separators=(',', ':')).replace('</', '<\\/')
+
+    def clear(self):
+        """
+        清空缓存的签名
+        """
+        self._current = (None, None, {})
+
+    def _build(self, jsapi_ticket, url, js_api_list, debug, timestamp, noncestr, signatures=None):
+        timestamp, noncestr, signature = self._sign(jsapi_ticket, url, timestamp, noncestr, signatures)
+        return {
+            'debug': self.debug if debug is None else debug,
+            'appId': self.wechat.appid,
+            'timestamp': timestamp,
+            'nonceStr': noncestr,
+            'signature': signature,
+            'jsApiList': list(self.js_api_list if js_api_list is None else js_api_list),
+        }
+
+    def _sign(self, jsapi_ticket, url, timestamp, noncestr, signatures=None):
+        url = url.split('#', 1)[0]
+        if signatures is None:
+            if timestamp is not None or noncestr is not None:
+                current_timestamp, current_noncestr, _ = self._get_current()
+                timestamp = current_timestamp if timestamp is None else timestamp
+                noncestr = current_noncestr if noncestr is None else noncestr
+                return timestamp, noncestr, sign_jsapi(jsapi_ticket, noncestr, timestamp, url)
+            timestamp, noncestr, signatures = self._get_current()
+        key = (jsapi_ticket, url)
+        signature = signatures.get(key)
+        if signature is None:
+            signature = sign_jsapi(jsapi_ticket, noncestr, timestamp, url)
+            if len(signatures) < self.max_entries:
+                signatures[key] = signature
+        return timestamp, noncestr, signature
+
+    def _get_current(self):
+        """
+        获取当前时间段的时间戳、随机数及签名缓存
+        """
+        now = int(time.time())
+        timestamp = now - now % self.bucket
+        current = self._current
+        if current[0] != timestamp:
+            current = self._current = (timestamp, self.noncestr_factory(), {})
+        return current
+
+    def _get_jsapi_ticket(self):
+        jsapi_ticket = self.wechat.jsapi_ticket
+        if not jsapi_ticket:
+            raise NeedParamError('jsapi_ticket is not available, call ensure_jsapi_ticket() first.')
+        return jsapi_ticket
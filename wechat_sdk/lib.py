@@ -1,33 +1,244 @@
 # -*- coding: utf-8 -*-
 
+import collections
+import errno
+import os
+import tempfile
+import threading
+import time
 from xml.dom import minidom, Node
+from xml.parsers import expat
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 系统
+    fcntl = None
+
+# Python 3.3 以下没有 os.replace, POSIX 系统上 os.rename 同样会原子地替换目标文件
+_replace = getattr(os, 'replace', os.rename)
+
+
+_urllib3_warning_disabled = False
 
 
 def disable_urllib3_warning():
     """
     https://urllib3.readthedocs.org/en/latest/security.html#insecurerequestwarning
-    InsecurePlatformWarning 警告的临时解决方案
+    InsecurePlatformWarning 警告的临时解决方案, 每个进程只执行一次
     """
+    global _urllib3_warning_disabled
+    if _urllib3_warning_disabled:
+        return
     try:
         import requests.packages.urllib3
         requests.packages.urllib3.disable_warnings()
     except Exception:
         pass
+    _urllib3_warning_disabled = True
+
+
+def atomic_write(path, content):
+    """
+    原子地写入文件: 先写入同目录下的临时文件 (权限为 0600) 并 fsync, 再替换目标文件, 读取方不会读到不完整的内容
+    :param path: 目标文件路径
+    :param content: 文件内容
+    """
+    directory, filename = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(prefix=filename + '.', dir=directory or '.')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        _replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class LRUCache(object):
+    """
+    线程安全的 LRU 缓存, 支持按条目数及按总大小限制容量, 每个条目可设置过期时间
+    """
+    def __init__(self, max_entries=None, max_size=None, sizeof=len):
+        """
+        :param max_entries: 最大条目数, 为 None 时不限制
+        :param max_size: 所有条目的 value 总大小上限, 为 None 时不限制
+        :param sizeof: 计算 value 大小的函数, 默认为 len
+        """
+        self._max_entries = max_entries
+        self._max_size = max_size
+        self._sizeof = sizeof
+        self._size = 0
+        self._data = collections.OrderedDict()  # key -> (value, expires_at, size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def size(self):
+        """
+        当前所有条目的 value 总大小
+        """
+        return self._size
+
+    def get(self, key, default=None):
+        """
+        获取缓存值, 并将该条目标记为最近使用
+        :param key: 缓存键
+        :param default: 条目不存在或已过期时的返回值
+        """
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is None:
+                return default
+            if item[1] is not None and item[1] <= time.time():
+                self._size -= item[2]
+                return default
+            self._data[key] = item
+            return item[0]
+
+    def set(self, key, value, ttl=None):
+        """
+        设置缓存值
+        :param key: 缓存键
+        :param value: 缓存值
+        :param ttl: 有效期 (秒), 为 None 时永不过期
+        """
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def add(self, key, value, ttl=None):
+        """
+        仅当条目不存在 (或已过期) 时设置缓存值
+        :return: 设置成功返回 True, 条目已存在返回 False
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and (item[1] is None or item[1] > time.time()):
+                return False
+            self._set(key, value, ttl)
+            return True
+
+    def delete(self, key):
+        """
+        删除缓存条目
+        """
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is not None:
+                self._size -= item[2]
+
+    def clear(self):
+        """
+        清空缓存
+        """
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def _set(self, key, value, ttl):
+        old = self._data.pop(key, None)
+        if old is not None:
+            self._size -= old[2]
+
+        size = self._sizeof(value) if self._max_size is not None else 0
+        if self._max_size is not None and size > self._max_size:
+            return
+        expires_at = time.time() + ttl if ttl is not None else None
+        self._data[key] = (value, expires_at, size)
+        self._size += size
+
+        while self._data and ((self._max_entries is not None and len(self._data) > self._max_entries) or
+                              (self._max_size is not None and self._size > self._max_size)):
+            self._size -= self._data.popitem(last=False)[1][2]
+
+
+class FileLock(object):
+    """
+    基于 fcntl.flock 的跨进程互斥锁, 同一进程内的多个线程之间同样互斥, 仅支持 POSIX 系统
+    """
+    def __init__(self, path):
+        """
+        :param path: 锁文件路径, 不存在时自动创建
+        """
+        if fcntl is None:
+            raise RuntimeError('FileLock requires fcntl, which is only available on POSIX systems.')
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = None
+
+    def acquire(self, blocking=True):
+        """
+        获取锁
+        :param blocking: 锁被占用时是否等待
+        :return: 是否成功获取锁
+        """
+        if not self._lock.acquire(blocking):
+            return False
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except Exception:
+                os.close(fd)
+                raise
+        except (IOError, OSError) as e:
+            self._lock.release()
+            if not blocking and e.errno in (errno.EAGAIN, errno.EACCES):
+                return False
+            raise
+        except Exception:
+            self._lock.release()
+            raise
+        self._fd = fd
+        return True
+
+    def release(self):
+        """
+        释放锁
+        """
+        fd, self._fd = self._fd, None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+            self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
 
 
 class XMLStore(object):
     """
     XML 存储类，可方便转换为 Dict
     """
-    def __init__(self, xmlstring):
+    def __init__(self, xmlstring, use_minidom=False):
+        """
+        :param xmlstring: XML 字符串
+        :param use_minidom: 是否使用 minidom 构建 DOM 树进行解析 (默认为 False, 使用基于 expat 的流式解析器一次遍历直接生成 dict)
+        """
         self._raw = xmlstring
-        self._doc = minidom.parseString(xmlstring)
+        self._use_minidom = use_minidom
+        if use_minidom:
+            self._doc = minidom.parseString(xmlstring)
+        else:
+            self._dict = _StreamingDictBuilder().parse(xmlstring)
 
     @property
     def xml2dict(self):
         """
         将 XML 转换为 dict
         """
+        if not self._use_minidom:
+            return dict(self._dict)
+
         self._remove_whitespace_nodes(self._doc.childNodes[0])
         return self._element2dict(self._doc.childNodes[0])
 
@@ -66,3 +277,91 @@ class XMLStore(object):
             node.parentNode.removeChild(node)
             if unlink:
                 node.unlink()
+
+
+class _StreamingDictBuilder(object):
+    """
+    基于 expat 的流式 XML 解析器
+
+    在解析事件中直接生成与 minidom 方式 (:func:`XMLStore._element2dict`) 结果一致的 dict, 不构建 DOM 树, 也无需额外遍历删除空白节点
+    """
+    ELEMENT = 0
+    TEXT = 1
+    CDATA = 2
+    OTHER = 3
+
+    def __init__(self):
+        # 栈中每一项为 [节点名, 子节点生成的 dict, 子节点列表], 子节点列表中每一项为 [节点类型, 文本数据]
+        self._stack = []
+        self._result = None
+        self._in_cdata = False
+        self._cdata_node = None
+
+    def parse(self, xmlstring):
+        """
+        解析 XML 字符串
+        :param xmlstring: XML 字符串
+        :return: 根节点转换得到的 dict
+        :raises ExpatError: XML 数据不合法
+        """
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = self._start_element
+        parser.EndElementHandler = self._end_element
+        parser.CharacterDataHandler = self._character_data
+        parser.StartCdataSectionHandler = self._start_cdata
+        parser.EndCdataSectionHandler = self._end_cdata
+        parser.CommentHandler = self._other_node
+        parser.ProcessingInstructionHandler = self._other_node
+        parser.Parse(xmlstring, True)
+        return self._result
+
+    def _start_element(self, name, attrs):
+        if self._stack:
+            self._stack[-1][2].append([self.ELEMENT, None])
+        self._stack.append([name, {}, []])
+
+    def _end_element(self, name):
+        name, d, nodes = self._stack.pop()
+        if not self._stack:
+            self._result = d
+            return
+
+        # 与 minidom 方式一致: 忽略仅包含空白字符的文本节点
+        nodes = [node for node in nodes if node[0] != self.TEXT or node[1].strip()]
+        if not nodes:
+            return
+
+        parent = self._stack[-1][1]
+        if nodes[0][0] == self.ELEMENT:
+            parent.setdefault(name, []).append(d)
+        elif len(nodes) == 1 and nodes[0][0] in (self.TEXT, self.CDATA):
+            parent[name] = nodes[0][1]
+
+    def _character_data(self, data):
+        if not self._stack:
+            return
+        nodes = self._stack[-1][2]
+        if self._in_cdata:
+            # 空的 CDATA 段不产生节点, 与 minidom 行为一致
+            if self._cdata_node is None:
+                self._cdata_node = [self.CDATA, data]
+                nodes.append(self._cdata_node)
+            else:
+                self._cdata_node[1] += data
+        elif nodes and nodes[-1][0] == self.TEXT:
+            nodes[-1][1] += data
+        else:
+            nodes.append([self.TEXT, data])
+
+    def _start_cdata(self):
+        self._in_cdata = True
+        self._cdata_node = None
+
+    def _end_cdata(self):
+        self._in_cdata = False
+        self._cdata_node = None
+
+    def _other_node(self, *args):
+        if self._stack:
+            self._stack[-1][2].append([self.OTHER, None])
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+from .basic import WechatBasic
+from .credential import ACCESS_TOKEN, JSAPI_TICKET, MemoryTokenStore, RefreshStateRegistry, TokenRefresher, credential_key
+from .decoder import MessageDecoder
+from .lib import disable_urllib3_warning
+from .retry import RetryPolicy
+from .session import create_session, get_pool_stats
+from .transport import RequestsTransport
+
+
+class WechatManager(object):
+    """
+    在同一进程中托管多个公众号
+
+    所有公众号共享同一个 Session (连接池)、传输层、消息解析器及凭证存储, 凭证由一个 TokenRefresher 统一在后台刷新
+    (一个线程, 按到期时间排序). 每个公众号只有一个 WechatBasic 实例, 由 get_client 返回, 后台刷新的凭证直接写入该实例.
+    凭证的刷新状态只在管理器内部共享, 不会与管理器之外 appid 相同的 WechatBasic 实例互相影响
+    """
+    def __init__(self, session=None, pool_sizes=None, transport=None, decoder=None, token_store=None,
+                 lock_factory=None, retry_policy=None, refresher=None, persist_path=None, checkssl=False):
+        """
+        :param session: 共享的 requests.Session 实例, 如果不传入, 将会自动创建带 keep-alive 连接池的 Session
+        :param pool_sizes: 自动创建 Session 时各主机的连接池大小, 主机 -> 连接池大小的 dict
+        :param transport: 共享的传输层, 如果不传入, 将会使用 session 发送请求
+        :param decoder: 共享的 MessageDecoder 实例, 如果不传入, 将会自动创建
+        :param token_store: 共享的凭证存储, 如果不传入, 将会使用 MemoryTokenStore
+        :param lock_factory: 跨进程刷新锁工厂, 同 WechatBasic 的 lock_factory 参数
+        :param retry_policy: 默认的重试策略, 如果不传入, 将会使用默认策略
+        :param refresher: 刷新凭证使用的 TokenRefresher 实例, 如果不传入, 将会自动创建
+        :param persist_path: 所有公众号共享的凭证快照文件路径, 同 WechatBasic 的 persist_path 参数
+        :param checkssl: 是否检查 SSL, 默认为 False, 可避免 urllib3 的 InsecurePlatformWarning 警告
+        """
+        if not checkssl:
+            disable_urllib3_warning()
+
+        self.session = session or create_session(pool_sizes)
+        self.transport = transport or RequestsTransport(self.session)
+        self.decoder = decoder or MessageDecoder()
+        self.token_store = token_store or MemoryTokenStore()
+        self.lock_factory = lock_factory
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.refresher = refresher or TokenRefresher()
+        self.persist_path = persist_path
+        self.checkssl = checkssl
+        self.refresh_states = RefreshStateRegistry()
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, appid):
+        return appid in self._clients
+
+    def __len__(self):
+        return len(self._clients)
+
+    def __getitem__(self, appid):
+        return self.get_client(appid)
+
+    @property
+    def appids(self):
+        """
+        已添加的所有公众号的 appid
+        """
+        return list(self._clients)
+
+    def add_account(self, appid, appsecret, token=None, refresh=(ACCESS_TOKEN,), **kwargs):
+        """
+        添加公众号, appid 已存在时替换原有配置, 并丢弃原有配置获取的凭证刷新状态
+        :param appid: App ID
+        :param appsecret: App Secret
+        :param token: 微信 Token
+        :param refresh: 需要在后台刷新的凭证名称, 使用 JS-SDK 的公众号可传入 ('access_token', 'jsapi_ticket'), 为空时不在后台刷新
+        :param kwargs: 创建 WechatBasic 时使用的其他参数, 如 partnerid, rate_limiter 等
+        """
+        client = self._create_client(dict(kwargs, token=token, appid=appid, appsecret=appsecret))
+        with self._lock:
+            previous = self._clients.get(appid)
+            self._clients[appid] = client
+        if previous is not None:
+            self.refresher.remove(previous)
+            self._discard_states(appid)
+        if refresh:
+            self.refresher.add(client, refresh)
+
+    def remove_account(self, appid):
+        """
+        移除公众号并停止在后台刷新其凭证
+        :param appid: App ID
+        """
+        with self._lock:
+            client = self._clients.pop(appid, None)
+        if client is not None:
+            self.refresher.remove(client)
+            self._discard_states(appid)
+
+    def get_client(self, appid):
+        """
+        获取公众号的 WechatBasic 实例, 同一公众号每次返回同一个实例. 实例在各线程间共享,
+        请使用 parse_message 及 reply_* 等不保存状态的方法处理消息, 不要使用 parse_data
+        :param appid: App ID
+        :return: WechatBasic 对象
+        :raises KeyError: appid 没有添加
+        """
+        return self._clients[appid]
+
+    def get_status(self):
+        """
+        获取所有公众号的凭证刷新状态及当日获取凭证的次数
+        :return: appid -> {'refresh': TokenRefresher.get_status() 中该公众号的条目, 'grants': get_grant_usage()} 的 dict
+        """
+        with self._lock:
+            clients = dict(self._clients)
+        status = dict((appid, {'refresh': [], 'grants': client.get_grant_usage()}) for appid, client in clients.items())
+        for item in self.refresher.get_status():
+            if item['appid'] in status:
+                status[item['appid']]['refresh'].append(item)
+        return status
+
+    def get_pool_stats(self):
+        """
+        获取共享连接池的统计数据, 格式同 WechatBasic.get_pool_stats
+        """
+        return get_pool_stats(self.session)
+
+    def close(self, timeout=None):
+        """
+        停止后台刷新并关闭共享的 Session
+        :param timeout: 等待刷新线程退出的最长时间 (秒)
+        """
+        self.refresher.stop(timeout)
+        self.session.close()
+
+    def _discard_states(self, appid):
+        for name in (ACCESS_TOKEN, JSAPI_TICKET):
+            self.refresh_states.discard(credential_key(appid, name))
+
+    def _create_client(self, options):
+        kwargs = dict(
+            checkssl=self.checkssl,
+            decoder=self.decoder,
+            session=self.session,
+            transport=self.transport,
+            token_store=self.token_store,
+            lock_factory=self.lock_factory,
+            retry_policy=self.retry_policy,
+            persist_path=self.persist_path,
+            refresh_states=self.refresh_states,
+        )
+        kwargs.update(options)
+        return WechatBasic(**kwargs)
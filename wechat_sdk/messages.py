@@ -9,117 +9,150 @@ MESSAGE_TYPES = {}
 def handle_for_type(type):
     def register(f):
         MESSAGE_TYPES[type] = f
+        f.msg_type = type
         return f
     return register
 
 
+def _fields_parser(parse):
+    """
+    消息字段解析函数的装饰器, 必需的节点不存在时引发 ParseError
+
+    解析函数从 message 中取出各字段并设置为 obj 的属性, 普通消息类 (WechatMessage) 与紧凑消息类 (CompactWechatMessage)
+    共用同一组解析函数, 两者的字段及校验规则保持一致
+    """
+    def wrapper(obj, message):
+        try:
+            parse(obj, message)
+        except KeyError:
+            raise ParseError()
+    return wrapper
+
+
+def _parse_header(obj, message):
+    obj.id = int(message.pop('MsgId', 0))
+    obj.target = message.pop('ToUserName', None)
+    obj.source = message.pop('FromUserName', None)
+    obj.time = int(message.pop('CreateTime', 0))
+
+
+@_fields_parser
+def _parse_text(obj, message):
+    obj.content = message.pop('Content', '')
+
+
+@_fields_parser
+def _parse_image(obj, message):
+    obj.picurl = message.pop('PicUrl')
+    obj.media_id = message.pop('MediaId')
+
+
+@_fields_parser
+def _parse_video(obj, message):
+    obj.media_id = message.pop('MediaId')
+    obj.thumb_media_id = message.pop('ThumbMediaId')
+
+
+@_fields_parser
+def _parse_location(obj, message):
+    location_x = message.pop('Location_X')
+    location_y = message.pop('Location_Y')
+    obj.location = (float(location_x), float(location_y))
+    obj.scale = int(message.pop('Scale'))
+    obj.label = message.pop('Label')
+
+
+@_fields_parser
+def _parse_link(obj, message):
+    obj.title = message.pop('Title')
+    obj.description = message.pop('Description')
+    obj.url = message.pop('Url')
+
+
+@_fields_parser
+def _parse_event(obj, message):
+    message.pop('type')
+    obj.type = message.pop('Event').lower()
+    if obj.type == 'subscribe' or obj.type == 'scan':
+        obj.key = message.pop('EventKey', None)
+        obj.ticket = message.pop('Ticket', None)
+    elif obj.type in ['click', 'view', 'scancode_push', 'scancode_waitmsg',
+                      'pic_sysphoto', 'pic_photo_or_album', 'pic_weixin', 'location_select']:
+        obj.key = message.pop('EventKey')
+    elif obj.type == 'location':
+        obj.latitude = float(message.pop('Latitude'))
+        obj.longitude = float(message.pop('Longitude'))
+        obj.precision = float(message.pop('Precision'))
+    elif obj.type == 'templatesendjobfinish':
+        obj.status = message.pop('Status')
+
+
+@_fields_parser
+def _parse_voice(obj, message):
+    obj.media_id = message.pop('MediaId')
+    obj.format = message.pop('Format')
+    obj.recognition = message.pop('Recognition', None)
+
+
 class WechatMessage(object):
     def __init__(self, message):
-        self.id = int(message.pop('MsgId', 0))
-        self.target = message.pop('ToUserName', None)
-        self.source = message.pop('FromUserName', None)
-        self.time = int(message.pop('CreateTime', 0))
+        _parse_header(self, message)
         self.__dict__.update(message)
 
 
 @handle_for_type('text')
 class TextMessage(WechatMessage):
     def __init__(self, message):
-        self.content = message.pop('Content', '')
+        _parse_text(self, message)
         super(TextMessage, self).__init__(message)
 
 
 @handle_for_type('image')
 class ImageMessage(WechatMessage):
     def __init__(self, message):
-        try:
-            self.picurl = message.pop('PicUrl')
-            self.media_id = message.pop('MediaId')
-        except KeyError:
-            raise ParseError()
+        _parse_image(self, message)
         super(ImageMessage, self).__init__(message)
 
 
 @handle_for_type('video')
 class VideoMessage(WechatMessage):
     def __init__(self, message):
-        try:
-            self.media_id = message.pop('MediaId')
-            self.thumb_media_id = message.pop('ThumbMediaId')
-        except KeyError:
-            raise ParseError()
+        _parse_video(self, message)
         super(VideoMessage, self).__init__(message)
 
 
 @handle_for_type('shortvideo')
 class ShortVideoMessage(WechatMessage):
     def __init__(self, message):
-        try:
-            self.media_id = message.pop('MediaId')
-            self.thumb_media_id = message.pop('ThumbMediaId')
-        except KeyError:
-            raise ParseError()
+        _parse_video(self, message)
         super(ShortVideoMessage, self).__init__(message)
 
 
 @handle_for_type('location')
 class LocationMessage(WechatMessage):
     def __init__(self, message):
-        try:
-            location_x = message.pop('Location_X')
-            location_y = message.pop('Location_Y')
-            self.location = (float(location_x), float(location_y))
-            self.scale = int(message.pop('Scale'))
-            self.label = message.pop('Label')
-        except KeyError:
-            raise ParseError()
+        _parse_location(self, message)
         super(LocationMessage, self).__init__(message)
 
 
 @handle_for_type('link')
 class LinkMessage(WechatMessage):
     def __init__(self, message):
-        try:
-            self.title = message.pop('Title')
-            self.description = message.pop('Description')
-            self.url = message.pop('Url')
-        except KeyError:
-            raise ParseError()
+        _parse_link(self, message)
         super(LinkMessage, self).__init__(message)
 
 
 @handle_for_type('event')
 class EventMessage(WechatMessage):
     def __init__(self, message):
-        message.pop('type')
-        try:
-            self.type = message.pop('Event').lower()
-            if self.type == 'subscribe' or self.type == 'scan':
-                self.key = message.pop('EventKey', None)
-                self.ticket = message.pop('Ticket', None)
-            elif self.type in ['click', 'view', 'scancode_push', 'scancode_waitmsg',
-                               'pic_sysphoto', 'pic_photo_or_album', 'pic_weixin', 'location_select']:
-                self.key = message.pop('EventKey')
-            elif self.type == 'location':
-                self.latitude = float(message.pop('Latitude'))
-                self.longitude = float(message.pop('Longitude'))
-                self.precision = float(message.pop('Precision'))
-            elif self.type == 'templatesendjobfinish':
-                self.status = message.pop('Status')
-        except KeyError:
-            raise ParseError()
+        _parse_event(self, message)
         super(EventMessage, self).__init__(message)
 
 
 @handle_for_type('voice')
 class VoiceMessage(WechatMessage):
     def __init__(self, message):
-        try:
-            self.media_id = message.pop('MediaId')
-            self.format = message.pop('Format')
-            self.recognition = message.pop('Recognition', None)
-        except KeyError:
-            raise ParseError()
+        _parse_voice(self, message)
         super(VoiceMessage, self).__init__(message)
 
 
@@ -127,3 +160,282 @@ class UnknownMessage(WechatMessage):
     def __init__(self, message):
         self.type = 'unknown'
         super(UnknownMessage, self).__init__(message)
+
+
+COMPACT_MESSAGE_TYPES = {}
+
+
+def handle_for_compact_type(type):
+    def register(f):
+        COMPACT_MESSAGE_TYPES[type] = f
+        f.msg_type = type
+        return f
+    return register
+
+
+class CompactWechatMessage(object):
+    """
+    紧凑消息类
+
+    与 WechatMessage 的属性一致, 但已知字段使用 __slots__ 声明, 实例不再携带 __dict__;
+    已知字段之外的其他字段以 (key1, value1, key2, value2, ...) 的扁平元组形式保存在 _extra 中 (没有其他字段时为 None),
+    仍可通过属性方式访问, 或通过 extra 属性获得 dict 形式的副本
+    """
+    __slots__ = ('id', 'target', 'source', 'time', 'type', 'raw', '_extra')
+
+    def __init__(self, message):
+        _parse_header(self, message)
+        if 'type' in message:
+            self.type = message.pop('type')
+        if 'raw' in message:
+            self.raw = message.pop('raw')
+        if message:
+            # 溢出字段通常只有一两个, 扁平元组比 dict 占用的空间小得多
+            self._extra = tuple(item for pair in message.items() for item in pair)
+        else:
+            self._extra = None
+
+    @property
+    def extra(self):
+        """
+        已知字段之外的其他字段
+        :return: dict 对象
+        """
+        if not self._extra:
+            return {}
+        return dict(zip(self._extra[::2], self._extra[1::2]))
+
+    def __getattr__(self, name):
+        try:
+            extra = object.__getattribute__(self, '_extra')
+        except AttributeError:
+            extra = None
+        if extra:
+            for i in range(0, len(extra), 2):
+                if extra[i] == name:
+                    return extra[i + 1]
+        raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, name))
+
+
+@handle_for_compact_type('text')
+class CompactTextMessage(CompactWechatMessage):
+    __slots__ = ('content',)
+
+    def __init__(self, message):
+        _parse_text(self, message)
+        super(CompactTextMessage, self).__init__(message)
+
+
+@handle_for_compact_type('image')
+class CompactImageMessage(CompactWechatMessage):
+    __slots__ = ('picurl', 'media_id')
+
+    def __init__(self, message):
+        _parse_image(self, message)
+        super(CompactImageMessage, self).__init__(message)
+
+
+@handle_for_compact_type('video')
+class CompactVideoMessage(CompactWechatMessage):
+    __slots__ = ('media_id', 'thumb_media_id')
+
+    def __init__(self, message):
+        _parse_video(self, message)
+        super(CompactVideoMessage, self).__init__(message)
+
+
+@handle_for_compact_type('shortvideo')
+class CompactShortVideoMessage(CompactWechatMessage):
+    __slots__ = ('media_id', 'thumb_media_id')
+
+    def __init__(self, message):
+        _parse_video(self, message)
+        super(CompactShortVideoMessage, self).__init__(message)
+
+
+@handle_for_compact_type('location')
+class CompactLocationMessage(CompactWechatMessage):
+    __slots__ = ('location', 'scale', 'label')
+
+    def __init__(self, message):
+        _parse_location(self, message)
+        super(CompactLocationMessage, self).__init__(message)
+
+
+@handle_for_compact_type('link')
+class CompactLinkMessage(CompactWechatMessage):
+    __slots__ = ('title', 'description', 'url')
+
+    def __init__(self, message):
+        _parse_link(self, message)
+        super(CompactLinkMessage, self).__init__(message)
+
+
+@handle_for_compact_type('event')
+class CompactEventMessage(CompactWechatMessage):
+    __slots__ = ('key', 'ticket', 'latitude', 'longitude', 'precision', 'status')
+
+    def __init__(self, message):
+        _parse_event(self, message)
+        super(CompactEventMessage, self).__init__(message)
+
+
+@handle_for_compact_type('voice')
+class CompactVoiceMessage(CompactWechatMessage):
+    __slots__ = ('media_id', 'format', 'recognition')
+
+    def __init__(self, message):
+        _parse_voice(self, message)
+        super(CompactVoiceMessage, self).__init__(message)
+
+
+class CompactUnknownMessage(CompactWechatMessage):
+    __slots__ = ()
+
+    def __init__(self, message):
+        self.type = 'unknown'
+        super(CompactUnknownMessage, self).__init__(message)
+
+
+LAZY_MESSAGE_TYPES = {}
+
+
+def handle_for_lazy_type(type):
+    def register(f):
+        LAZY_MESSAGE_TYPES[type] = f
+        f.msg_type = type
+        return f
+    return register
+
+
+def _lower(value):
+    return value.lower()
+
+
+def _location(location_x, location_y):
+    return float(location_x), float(location_y)
+
+
+_NO_DEFAULT = object()
+
+
+class LazyWechatMessage(object):
+    """
+    惰性消息类
+
+    构造时只保存原始数据及各字段值在其中的位置, 属性在首次访问时才解码并转换类型, 之后缓存在实例中直接读取.
+    FIELDS 定义了属性名与 XML 节点的对应关系: {属性名: (节点名或节点名元组, 转换函数, 默认值)},
+    节点不存在且没有默认值时访问该属性将引发 AttributeError (惰性模式下不进行字段完整性校验);
+    FIELDS 之外的其他节点可直接以节点名作为属性名访问, 值为解码后的字符串
+    """
+    FIELDS = {
+        'id': ('MsgId', int, 0),
+        'target': ('ToUserName', None, None),
+        'source': ('FromUserName', None, None),
+        'time': ('CreateTime', int, 0),
+    }
+
+    def __init__(self, buffer, spans, type, raw=None):
+        """
+        :param buffer: HTTP Request 的 Body 数据 (bytes), 各属性均从中解码
+        :param spans: dict 对象, key 为节点名, value 为 (start, end) 形式的节点值在 buffer 中的位置
+        :param type: 消息类型 (MsgType 的小写形式)
+        :param raw: raw 属性的值, 由解码器的原始数据保留策略决定
+        """
+        self.raw = raw
+        self._buffer = buffer
+        self._spans = spans
+        if 'type' not in self.FIELDS:
+            self.type = type
+
+    def __getattr__(self, name):
+        spec = self.FIELDS.get(name)
+        if spec is None:
+            if name.startswith('_') or name not in self._spans:
+                raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, name))
+            value = self._decode(name)
+        else:
+            tags, convert, default = spec
+            spans = self._spans
+            if isinstance(tags, tuple):
+                if all(tag in spans for tag in tags):
+                    value = convert(*[self._decode(tag) for tag in tags])
+                else:
+                    value = default
+            elif tags in spans:
+                value = self._decode(tags)
+                if convert is not None:
+                    value = convert(value)
+            else:
+                value = default
+            if value is _NO_DEFAULT:
+                raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, name))
+
+        self.__dict__[name] = value
+        return value
+
+    def _decode(self, tag):
+        start, end = self._spans[tag]
+        return self._buffer[start:end].decode('utf-8')
+
+
+@handle_for_lazy_type('text')
+class LazyTextMessage(LazyWechatMessage, TextMessage):
+    FIELDS = dict(LazyWechatMessage.FIELDS, content=('Content', None, ''))
+
+
+@handle_for_lazy_type('image')
+class LazyImageMessage(LazyWechatMessage, ImageMessage):
+    FIELDS = dict(LazyWechatMessage.FIELDS,
+                  picurl=('PicUrl', None, _NO_DEFAULT),
+                  media_id=('MediaId', None, _NO_DEFAULT))
+
+
+@handle_for_lazy_type('video')
+class LazyVideoMessage(LazyWechatMessage, VideoMessage):
+    FIELDS = dict(LazyWechatMessage.FIELDS,
+                  media_id=('MediaId', None, _NO_DEFAULT),
+                  thumb_media_id=('ThumbMediaId', None, _NO_DEFAULT))
+
+
+@handle_for_lazy_type('shortvideo')
+class LazyShortVideoMessage(LazyWechatMessage, ShortVideoMessage):
+    FIELDS = dict(LazyWechatMessage.FIELDS,
+                  media_id=('MediaId', None, _NO_DEFAULT),
+                  thumb_media_id=('ThumbMediaId', None, _NO_DEFAULT))
+
+
+@handle_for_lazy_type('location')
+class LazyLocationMessage(LazyWechatMessage, LocationMessage):
+    FIELDS = dict(LazyWechatMessage.FIELDS,
+                  location=(('Location_X', 'Location_Y'), _location, _NO_DEFAULT),
+                  scale=('Scale', int, _NO_DEFAULT),
+                  label=('Label', None, _NO_DEFAULT))
+
+
+@handle_for_lazy_type('link')
+class LazyLinkMessage(LazyWechatMessage, LinkMessage):
+    FIELDS = dict(LazyWechatMessage.FIELDS,
+                  title=('Title', None, _NO_DEFAULT),
+                  description=('Description', None, _NO_DEFAULT),
+                  url=('Url', None, _NO_DEFAULT))
+
+
+@handle_for_lazy_type('event')
+class LazyEventMessage(LazyWechatMessage, EventMessage):
+    FIELDS = dict(LazyWechatMessage.FIELDS,
+                  type=('Event', _lower, _NO_DEFAULT),
+                  key=('EventKey', None, None),
+                  ticket=('Ticket', None, None),
+                  latitude=('Latitude', float, _NO_DEFAULT),
+                  longitude=('Longitude', float, _NO_DEFAULT),
+                  precision=('Precision', float, _NO_DEFAULT),
+                  status=('Status', None, _NO_DEFAULT))
+
+
+@handle_for_lazy_type('voice')
+class LazyVoiceMessage(LazyWechatMessage, VoiceMessage):
+    FIELDS = dict(LazyWechatMessage.FIELDS,
+                  media_id=('MediaId', None, _NO_DEFAULT),
+                  format=('Format', None, _NO_DEFAULT),
+                  recognition=('Recognition', None, None))
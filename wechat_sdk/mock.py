@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import itertools
+import json
+import random
+import threading
+import time
+
+from .transport import Response
+
+
+# 模拟服务器返回的错误码及说明
+ERRORS = {
+    -1: 'system error',
+    40001: 'invalid credential, access_token is invalid or not latest',
+    40002: 'invalid grant_type',
+    40003: 'invalid openid',
+    40007: 'invalid media_id',
+    40013: 'invalid appid',
+    40125: 'invalid appsecret',
+    41001: 'access_token missing',
+    42001: 'access_token expired',
+    44002: 'empty post data',
+    45009: 'reach max api daily quota limit',
+    46003: 'menu no exist',
+}
+
+# 重新获取 access_token 后旧 access_token 仍然有效的时间 (秒)
+TOKEN_GRACE_PERIOD = 300
+
+
+class MockWechatServer(object):
+    """
+    进程内模拟的微信服务器
+
+    模拟 WechatBasic 使用到的 cgi-bin 接口, 校验 appid/appsecret 及 access_token, 可配置响应延迟、按接口的每日调用次数上限,
+    并可注入指定的错误码或按比例随机返回错误, 配合 wechat_sdk.transport.MockTransport 使用, 用于离线测试及压力测试
+    """
+    def __init__(self, appid='appid', appsecret='appsecret', latency=0, token_expires_in=7200, quotas=None,
+                 error_rate=0, error_code=-1, followers=100, seed=None):
+        """
+        :param appid: 合法的 App ID
+        :param appsecret: 合法的 App Secret
+        :param latency: 每次请求的延迟 (秒), 为 (最小值, 最大值) tuple 时在该范围内随机取值
+        :param token_expires_in: 颁发的 access_token 及 jsapi_ticket 的有效期 (秒)
+        :param quotas: 接口 -> 每日调用次数上限的 dict, 接口为 cgi-bin/ 之后的路径, 如 {'token': 2000, 'message/custom/send': 500000}
+        :param error_rate: 随机返回错误的比例, 0 ~ 1
+        :param error_code: 随机返回的错误码, 默认为 -1 (系统繁忙)
+        :param followers: 模拟的关注者数量
+        :param seed: 随机数种子
+        """
+        self.appid = appid
+        self.appsecret = appsecret
+        self.latency = latency
+        self.token_expires_in = token_expires_in
+        self.quotas = dict(quotas or {})
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.followers = followers
+
+        self.calls = collections.Counter()
+        self._usage = collections.Counter()
+        self._usage_day = None
+        self._faults = collections.defaultdict(collections.deque)
+        self._tokens = {}  # access_token -> 过期时间
+        self._menu = None
+        self._media = {}
+        self._groups = {0: u'未分组', 1: u'黑名单', 2: u'星标组'}
+        self._user_groups = {}
+        self._ids = itertools.count(1)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self._handlers = {
+            'token': self._token,
+            'ticket/getticket': self._getticket,
+            'menu/create': self._menu_create,
+            'menu/get': self._menu_get,
+            'menu/delete': self._menu_delete,
+            'media/upload': self._media_upload,
+            'media/get': self._media_get,
+            'groups/create': self._groups_create,
+            'groups/get': self._groups_get,
+            'groups/getid': self._groups_getid,
+            'groups/update': self._groups_update,
+            'groups/members/update': self._groups_members_update,
+            'user/info': self._user_info,
+            'user/get': self._user_get,
+            'message/custom/send': self._ok,
+            'qrcode/create': self._qrcode_create,
+            'showqrcode': self._showqrcode,
+            'template/api_set_industry': self._ok,
+            'template/api_add_template': self._api_add_template,
+            'message/template/send': self._template_send,
+        }
+
+    def get_latency(self):
+        """
+        获取本次请求的延迟 (秒)
+        """
+        if isinstance(self.latency, (tuple, list)):
+            return self._random.uniform(*self.latency)
+        return self.latency
+
+    def fail(self, endpoint, errcode, times=1):
+        """
+        注入错误, 指定接口接下来的 times 次请求返回 errcode
+        :param endpoint: 接口, 为 cgi-bin/ 之后的路径, 如 'message/custom/send'
+        :param errcode: 返回的错误码, 为 HTTP 状态码 (400 ~ 599) 时返回对应的 HTTP 错误
+        :param times: 返回错误的次数
+        """
+        with self._lock:
+            self._faults[endpoint].extend([errcode] * times)
+
+    def expire_tokens(self):
+        """
+        使所有已颁发的 access_token 立即过期
+        """
+        with self._lock:
+            for access_token in self._tokens:
+                self._tokens[access_token] = 0
+
+    def reset(self):
+        """
+        清空调用次数统计、当日已用调用次数及注入的错误
+        """
+        with self._lock:
+            self.calls.clear()
+            self._usage.clear()
+            self._faults.clear()
+
+    def get_usage(self, endpoint):
+        """
+        获取指定接口当日已使用的调用次数
+        :param endpoint: 接口, 为 cgi-bin/ 之后的路径
+        """
+        with self._lock:
+            self._roll_quota_day()
+            return self._usage[endpoint]
+
+    def handle(self, method, url, params=None, data=None, files=None, headers=None):
+        """
+        处理一次请求
+        :return: wechat_sdk.transport.Response 对象
+        """
+        path = url.split('?', 1)[0]
+        endpoint = path.split('/cgi-bin/', 1)[-1] if '/cgi-bin/' in path else None
+        handler = self._handlers.get(endpoint)
+        if handler is None:
+            return Response(404, b'Not Found', {'Content-Type': 'text/plain'}, url)
+        params = params or {}
+        if data is not None and not isinstance(data, dict):
+            try:
+                data = json.loads(data.decode('utf-8') if isinstance(data, bytes) else data)
+            except ValueError:
+                return self._error(url, 44002)
+
+        with self._lock:
+            self.calls[endpoint] += 1
+            if self._faults.get(endpoint):
+                errcode = self._faults[endpoint].popleft()
+                if 400 <= errcode < 600:
+                    return Response(errcode, b'', {'Content-Type': 'text/plain'}, url)
+                return self._error(url, errcode)
+            if self.error_rate and self._random.random() < self.error_rate:
+                return self._error(url, self.error_code)
+            if endpoint not in ('token', 'showqrcode'):
+                errcode = self._check_access_token(params.get('access_token'))
+                if errcode:
+                    return self._error(url, errcode)
+            self._roll_quota_day()
+            if endpoint in self.quotas and self._usage[endpoint] >= self.quotas[endpoint]:
+                return self._error(url, 45009)
+            self._usage[endpoint] += 1
+            result = handler(params, data or {}, files or {})
+
+        if isinstance(result, Response):
+            result.url = url
+            return result
+        if isinstance(result, int):
+            return self._error(url, result)
+        return self._json(url, result)
+
+    def _roll_quota_day(self):
+        """
+        每日零点 (北京时间) 清空当日已用调用次数
+        """
+        day = int((time.time() + 8 * 3600) // 86400)
+        if day != self._usage_day:
+            self._usage_day = day
+            self._usage.clear()
+
+    def _check_access_token(self, access_token):
+        if not access_token:
+            return 41001
+        expires_at = self._tokens.get(access_token)
+        if expires_at is None:
+            return 40001
+        if expires_at <= time.time():
+            return 42001
+        return 0
+
+    def _new_id(self, prefix):
+        return '{}_{}_{:08x}'.format(prefix, next(self._ids), self._random.getrandbits(32))
+
+    def _json(self, url, data):
+        return Response(200, json.dumps(data, ensure_ascii=False).encode('utf-8'),
+                        {'Content-Type': 'application/json; encoding=utf-8'}, url)
+
+    def _error(self, url, errcode):
+        return self._json(url, {'errcode': errcode, 'errmsg': ERRORS.get(errcode, 'error')})
+
+    def _ok(self, params, data, files):
+        return {'errcode': 0, 'errmsg': 'ok'}
+
+    def _token(self, params, data, files):
+        if params.get('grant_type') != 'client_credential':
+            return 40002
+        if params.get('appid') != self.appid:
+            return 40013
+        if params.get('secret') != self.appsecret:
+            return 40125
+        now = time.time()
+        for access_token, expires_at in self._tokens.items():
+            self._tokens[access_token] = min(expires_at, now + TOKEN_GRACE_PERIOD)
+        access_token = self._new_id('ACCESS_TOKEN')
+        self._tokens[access_token] = now + self.token_expires_in
+        return {'access_token': access_token, 'expires_in': self.token_expires_in}
+
+    def _getticket(self, params, data, files):
+        if params.get('type') != 'jsapi':
+            return 40002
+        return {'errcode': 0, 'errmsg': 'ok', 'ticket': self._new_id('TICKET'), 'expires_in': self.token_expires_in}
+
+    def _menu_create(self, params, data, files):
+        self._menu = data
+        return self._ok(params, data, files)
+
+    def _menu_get(self, params, data, files):
+        if self._menu is None:
+            return 46003
+        return {'menu': self._menu}
+
+    def _menu_delete(self, params, data, files):
+        self._menu = None
+        return self._ok(params, data, files)
+
+    def _media_upload(self, params, data, files):
+        if 'media' not in files:
+            return 44002
+        filename, fileobj, content_type = files['media']
+        media_id = self._new_id('MEDIA')
+        self._media[media_id] = (fileobj.read(), content_type)
+        return {'type': params.get('type'), 'media_id': media_id, 'created_at': int(time.time())}
+
+    def _media_get(self, params, data, files):
+        if params.get('media_id') not in self._media:
+            return 40007
+        content, content_type = self._media[params['media_id']]
+        return Response(200, content, {'Content-Type': content_type})
+
+    def _groups_create(self, params, data, files):
+        group_id = max(self._groups) + 1
+        self._groups[group_id] = data.get('group', {}).get('name', '')
+        return {'group': {'id': group_id, 'name': self._groups[group_id]}}
+
+    def _groups_get(self, params, data, files):
+        counts = collections.Counter(self._user_groups.values())
+        return {'groups': [{'id': group_id, 'name': name, 'count': counts[group_id]}
+                           for group_id, name in sorted(self._groups.items())]}
+
+    def _groups_getid(self, params, data, files):
+        if not data.get('openid'):
+            return 40003
+        return {'groupid': self._user_groups.get(data['openid'], 0)}
+
+    def _groups_update(self, params, data, files):
+        group = data.get('group', {})
+        if group.get('id') in self._groups:
+            self._groups[group['id']] = group.get('name', '')
+        return self._ok(params, data, files)
+
+    def _groups_members_update(self, params, data, files):
+        if not data.get('openid'):
+            return 40003
+        self._user_groups[data['openid']] = data.get('to_groupid', 0)
+        return self._ok(params, data, files)
+
+    def _user_info(self, params, data, files):
+        openid = params.get('openid')
+        if not openid:
+            return 40003
+        return {
+            'subscribe': 1,
+            'openid': openid,
+            'nickname': 'user_{}'.format(openid),
+            'sex': 1,
+            'language': params.get('lang', 'zh_CN'),
+            'city': '',
+            'province': '',
+            'country': '',
+            'headimgurl': '',
+            'subscribe_time': int(time.time()),
+        }
+
+    def _user_get(self, params, data, files):
+        start = 0
+        if params.get('next_openid'):
+            start = int(params['next_openid'].rsplit('_', 1)[-1]) + 1
+        openids = ['OPENID_{}'.format(i) for i in range(start, min(start + 10000, self.followers))]
+        return {
+            'total': self.followers,
+            'count': len(openids),
+            'data': {'openid': openids},
+            'next_openid': openids[-1] if openids else '',
+        }
+
+    def _qrcode_create(self, params, data, files):
+        ticket = self._new_id('TICKET')
+        result = {'ticket': ticket, 'url': 'http://weixin.qq.com/q/{}'.format(ticket)}
+        if 'expire_seconds' in data:
+            result['expire_seconds'] = data['expire_seconds']
+        return result
+
+    def _showqrcode(self, params, data, files):
+        if not params.get('ticket'):
+            return Response(404, b'', {'Content-Type': 'text/plain'})
+        return Response(200, b'\xff\xd8\xff\xe0' + params['ticket'].encode('utf-8'), {'Content-Type': 'image/jpg'})
+
+    def _api_add_template(self, params, data, files):
+        return {'errcode': 0, 'errmsg': 'ok', 'template_id': self._new_id('TEMPLATE')}
+
+    def _template_send(self, params, data, files):
+        return {'errcode': 0, 'errmsg': 'ok', 'msgid': next(self._ids)}
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+import time
+
+from .exceptions import QuotaExceededError, RateLimitExceededError
+from .lib import FileLock, atomic_write
+
+
+def endpoint_from_url(url):
+    """
+    获取接口名称, 即 url 中 cgi-bin/ 之后的路径, 如 'message/custom/send'
+    :param url: 请求地址或接口名称
+    """
+    path = url.split('?', 1)[0]
+    if '/cgi-bin/' in path:
+        return path.split('/cgi-bin/', 1)[1]
+    return path
+
+
+def quota_day(now=None):
+    """
+    获取微信每日调用次数重置所使用的日期序号 (北京时间零点重置)
+    """
+    if now is None:
+        now = time.time()
+    return int((now + 8 * 3600) // 86400)
+
+
+class RateLimit(object):
+    """
+    单个接口的调用频率限制
+    """
+    def __init__(self, rate=None, burst=None, daily=None):
+        """
+        :param rate: 每秒允许的调用次数, 为 None 时不限制调用频率
+        :param burst: 允许的突发调用次数 (令牌桶容量), 默认为 max(rate, 1)
+        :param daily: 每日调用次数上限, 为 None 时不限制
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate or 1, 1)
+        self.daily = daily
+
+
+class MemoryRateLimitStore(object):
+    """
+    保存在当前进程内存中的限流状态
+    """
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key)
+
+    def update(self, key, func):
+        """
+        原子地更新 key 对应的状态
+        :param func: 接收当前状态 (不存在时为 None), 返回 (新状态, 返回值)
+        :return: func 的返回值
+        """
+        with self._lock:
+            state, result = func(self._data.get(key))
+            self._data[key] = state
+            return result
+
+
+class FileRateLimitStore(object):
+    """
+    保存在 JSON 文件中的限流状态, 读写时持有文件锁, 写入时原子地替换文件, 可在同一台机器的多个进程之间共享, 仅支持 POSIX 系统
+    """
+    def __init__(self, path):
+        """
+        :param path: 状态文件路径, 同目录下会创建 path + '.lock' 锁文件
+        """
+        self.path = path
+        self._lock = FileLock(path + '.lock')
+
+    def get(self, key):
+        with self._lock:
+            return self._load().get(key)
+
+    def update(self, key, func):
+        with self._lock:
+            data = self._load()
+            state, result = func(data.get(key))
+            data[key] = state
+            atomic_write(self.path, json.dumps(data))
+            return result
+
+    def _load(self):
+        """
+        读取状态文件, 文件不存在或内容无法解析时返回空 dict
+        """
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+
+class RateLimiter(object):
+    """
+    按接口限制官方 API 的调用频率及每日调用次数
+
+    每个接口使用一个令牌桶, 调用频率超出限制时在令牌桶中预约令牌并等待至令牌可用, 多个调用按预约顺序平滑地依次发出;
+    每日调用次数达到上限 (或微信服务器返回 45009) 后, 当天剩余时间内的调用直接抛出 QuotaExceededError.
+    状态保存在 store 中, 使用 FileRateLimitStore 或自定义的共享存储即可在多个进程之间共享限制
+    """
+    def __init__(self, limits, store=None, namespace='', max_wait=None):
+        """
+        :param limits: 接口名称 -> RateLimit 的 dict, 接口名称为 url 中 cgi-bin/ 之后的路径, 如 {'message/custom/send': RateLimit(rate=100)}
+        :param store: 限流状态存储, 默认为 MemoryRateLimitStore
+        :param namespace: 状态存储中使用的键前缀, 多个公众号共享存储时可以使用各自的 appid
+        :param max_wait: 默认的最长等待时间 (秒), 需要等待更久时抛出 RateLimitExceededError, 为 None 时不限制
+        """
+        self.limits = dict(limits)
+        self.store = store or MemoryRateLimitStore()
+        self.namespace = namespace
+        self.max_wait = max_wait
+
+    def reserve(self, endpoint, max_wait=None):
+        """
+        预约一次调用, 不进行等待
+        :param endpoint: 接口名称或请求地址
+        :param max_wait: 最长等待时间 (秒), 默认使用构造时传入的值
+        :return: 需要等待的时间 (秒), 等待结束后即可发出调用
+        :raises QuotaExceededError: 当日调用次数已达上限
+        :raises RateLimitExceededError: 需要等待的时间超过 max_wait
+        """
+        endpoint = endpoint_from_url(endpoint)
+        limit = self.limits.get(endpoint)
+        if limit is None:
+            return 0
+        if max_wait is None:
+            max_wait = self.max_wait
+
+        def take(state):
+            now = time.time()
+            state = self._roll(state, limit, now)
+            if limit.daily is not None and (state['exhausted'] or state['used'] >= limit.daily):
+                return state, None
+            wait = 0
+            if limit.rate:
+                tokens = min(limit.burst, state['tokens'] + (now - state['updated_at']) * limit.rate)
+                wait = max(0.0, (1 - tokens) / limit.rate)
+                state['updated_at'] = now
+                if max_wait is not None and wait > max_wait:
+                    state['tokens'] = tokens
+                    return state, -wait
+                state['tokens'] = tokens - 1
+            state['used'] += 1
+            return state, wait
+
+        wait = self.store.update(self._key(endpoint), take)
+        if wait is None:
+            raise QuotaExceededError('{}: daily quota of {} calls exhausted'.format(endpoint, limit.daily),
+                                     errcode=45009, errmsg='reach max api daily quota limit')
+        if wait < 0:
+            raise RateLimitExceededError('{}: rate limit exceeded, need to wait {:.3f}s'.format(endpoint, -wait),
+                                         errcode=45009, errmsg='api freq out of limit')
+        return wait
+
+    def acquire(self, endpoint, max_wait=None):
+        """
+        预约一次调用, 并在当前线程中等待至可以发出调用
+        参数及异常与 reserve 相同
+        """
+        wait = self.reserve(endpoint, max_wait)
+        if wait > 0:
+            time.sleep(wait)
+
+    def mark_exhausted(self, endpoint):
+        """
+        微信服务器返回 45009 时调用, 当天剩余时间内该接口的调用直接抛出 QuotaExceededError
+        :param endpoint: 接口名称或请求地址
+        """
+        endpoint = endpoint_from_url(endpoint)
+        limit = self.limits.get(endpoint)
+        if limit is None or limit.daily is None:
+            return
+
+        def exhaust(state):
+            state = self._roll(state, limit, time.time())
+            state['exhausted'] = True
+            return state, None
+
+        self.store.update(self._key(endpoint), exhaust)
+
+    def remaining(self, endpoint):
+        """
+        获取接口当日剩余的调用次数
+        :param endpoint: 接口名称或请求地址
+        :return: 剩余调用次数, 接口没有每日调用次数限制时返回 None
+        """
+        endpoint = endpoint_from_url(endpoint)
+        limit = self.limits.get(endpoint)
+        if limit is None or limit.daily is None:
+            return None
+        state = self._roll(self.store.get(self._key(endpoint)), limit, time.time())
+        if state['exhausted']:
+            return 0
+        return max(limit.daily - state['used'], 0)
+
+    def get_status(self):
+        """
+        获取所有接口的当日剩余调用次数
+        :return: 接口名称 -> 剩余调用次数 (不限制时为 None) 的 dict
+        """
+        return dict((endpoint, self.remaining(endpoint)) for endpoint in self.limits)
+
+    def _key(self, endpoint):
+        return '{}:{}'.format(self.namespace, endpoint) if self.namespace else endpoint
+
+    def _roll(self, state, limit, now):
+        """
+        初始化状态, 并在日期变化时清空当日调用次数
+        """
+        day = quota_day(now)
+        if state is None:
+            return {'tokens': limit.burst, 'updated_at': now, 'day': day, 'used': 0, 'exhausted': False}
+        state = dict(state)
+        if state['day'] != day:
+            state.update(day=day, used=0, exhausted=False)
+        return state
@@ -1,26 +1,258 @@
 # -*- coding: utf-8 -*-
 
+import re
 import time
+from string import Formatter
 
-from .messages import WechatMessage
+from .lib import LRUCache
+from .messages import WechatMessage, CompactWechatMessage
+
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
+
+class CompiledTemplate(object):
+    """
+    预编译的回复模板
+
+    编译时去除标签之间用于排版的空白, 按固定片段与字段拆分模板, 固定片段预先编码为 UTF-8 bytes, 并记录每个字段是否位于 CDATA 中.
+    渲染时依次输出固定片段及编码后的字段值 (只检查 CDATA 中的字段是否包含 ']]>'), 最后一次拼接
+    """
+    WHITESPACE_BETWEEN_TAGS = re.compile(r'>\s+<')
+
+    def __init__(self, template):
+        """
+        :param template: str.format 形式的模板
+        """
+        self.template = self.WHITESPACE_BETWEEN_TAGS.sub('><', template.strip())
+        # 每一项为 (固定片段, 字段名, 字段是否位于 CDATA 中), 字段名为 None 表示其后没有字段
+        self.ops = []
+        for literal, name, _, _ in Formatter().parse(self.template):
+            in_cdata = literal.endswith('<![CDATA[') if name is not None else False
+            self.ops.append((literal.encode('utf-8'), name, in_cdata))
+        self.fields = [(name, in_cdata) for _, name, in_cdata in self.ops if name is not None]
+        self.names = tuple(name for name, _ in self.fields)
+        self._sections = None
+
+    @property
+    def sections(self):
+        """
+        在 </CreateTime> 之后拆分得到的 (消息头模板, 消息体模板), 消息头只包含接收方、发送方及创建时间三个字段
+        """
+        if self._sections is None:
+            self._sections = self.split(u'</CreateTime>')
+        return self._sections
+
+    def split(self, marker):
+        """
+        在 marker 之后将模板拆分为前后两个预编译模板
+        :param marker: 拆分位置的标记文本
+        :return: (前半部分, 后半部分), 模板中不包含 marker 时返回 None
+        """
+        index = self.template.find(marker)
+        if index < 0:
+            return None
+        index += len(marker)
+        return CompiledTemplate(self.template[:index]), CompiledTemplate(self.template[index:])
+
+    def render(self, args):
+        """
+        将模板渲染为 UTF-8 bytes
+        :param args: 字段值 dict, 格式同 render_parts
+        """
+        return b''.join(self.render_parts(args))
+
+    def render_parts(self, args, parts=None):
+        """
+        将模板渲染为 bytes 片段列表, 不进行拼接
+        :param args: 字段值 dict, 字段值为 list 对象时视为已渲染好的 bytes 片段列表, 原样插入
+        :param parts: 追加片段的目标列表, 默认新建
+        :return: bytes 片段列表
+        """
+        if parts is None:
+            parts = []
+        append = parts.append
+        for literal, name, in_cdata in self.ops:
+            if literal:
+                append(literal)
+            if name is not None:
+                value = args[name]
+                if type(value) is text_type:
+                    if in_cdata and u']]>' in value:
+                        value = value.replace(u']]>', u']]]]><![CDATA[>')
+                    append(value.encode('utf-8'))
+                elif type(value) is list:
+                    parts.extend(value)
+                else:
+                    append(_escape_field(value, in_cdata).encode('utf-8'))
+        return parts
+
+
+def _escape_field(value, in_cdata=False):
+    """
+    将字段值转换为文本
+    :param value: 字段值, bytes 按 UTF-8 解码
+    :param in_cdata: 字段是否位于 CDATA 中, 是则将 ']]>' 拆分到两个 CDATA 段中
+    """
+    if not isinstance(value, text_type):
+        value = value.decode('utf-8') if isinstance(value, bytes) else u'{}'.format(value)
+    if in_cdata and u']]>' in value:
+        value = value.replace(u']]>', u']]]]><![CDATA[>')
+    return value
+
+
+def _to_text(value):
+    """
+    将 bytes 字段值按 UTF-8 解码, 使各渲染方式 (str.format 及按字段拼接) 得到相同的结果, 其他类型原样返回
+    """
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+class ReplyCache(object):
+    """
+    回复消息体缓存
+
+    内容相同、仅接收方、发送方及创建时间不同的回复, 只在第一次渲染时生成消息体, 之后每次只将这三个字段填入预编码的消息头片段并与缓存的消息体拼接.
+    只缓存 get_cache_key() 不为 None 的回复 (图文消息), 其他回复直接渲染. 缓存按最近最少使用淘汰, 容量按条目数及消息体总字节数限制
+    """
+    def __init__(self, max_entries=None, max_size=4 * 1024 * 1024):
+        """
+        :param max_entries: 最大缓存条目数, 为 None 时不限制
+        :param max_size: 缓存的消息体总字节数上限, 为 None 时不限制
+        """
+        self._cache = LRUCache(max_entries=max_entries, max_size=max_size)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    @property
+    def size(self):
+        """
+        当前缓存的消息体总字节数
+        """
+        return self._cache.size
+
+    def get_body(self, reply):
+        """
+        获取回复的消息体 (UTF-8 bytes), 未缓存时渲染并加入缓存
+        :param reply: WechatReply 对象
+        """
+        return self._get_body(reply, reply.get_cache_key())
+
+    def render(self, reply):
+        """
+        渲染回复, 结果与 reply.render_bytes() 一致
+        :param reply: WechatReply 对象
+        :return: UTF-8 bytes
+        """
+        key = reply.get_cache_key()
+        if key is None:
+            return reply.render_bytes()
+        return b''.join(self._render_chunks(reply, key))
+
+    def render_chunks(self, reply):
+        """
+        将回复渲染为 bytes 片段列表, 拼接后与 reply.render_bytes() 一致
+        消息头中的固定片段及缓存的消息体直接引用, 不进行复制
+        :param reply: WechatReply 对象
+        """
+        key = reply.get_cache_key()
+        if key is None:
+            return reply.render_chunks()
+        return self._render_chunks(reply, key)
+
+    def _render_chunks(self, reply, key):
+        chunks = reply.get_compiled_template().sections[0].render_parts(reply.args)
+        chunks.append(self._get_body(reply, key))
+        return chunks
+
+    def _get_body(self, reply, key):
+        if key is None:
+            return reply.render_body()
+        try:
+            body = self._cache.get(key)
+        except TypeError:  # 字段值不可哈希, 不进行缓存
+            return reply.render_body()
+        if body is None:
+            self.misses += 1
+            body = reply.render_body()
+            self._cache.set(key, body)
+        else:
+            self.hits += 1
+        return body
+
+    def clear(self):
+        """
+        清空缓存
+        """
+        self._cache.clear()
 
 
 class WechatReply(object):
     def __init__(self, message=None, **kwargs):
-        if 'source' not in kwargs and isinstance(message, WechatMessage):
+        if 'source' not in kwargs and isinstance(message, (WechatMessage, CompactWechatMessage)):
             kwargs['source'] = message.target
-        if 'target' not in kwargs and isinstance(message, WechatMessage):
+        if 'target' not in kwargs and isinstance(message, (WechatMessage, CompactWechatMessage)):
             kwargs['target'] = message.source
         if 'time' not in kwargs:
             kwargs['time'] = int(time.time())
 
         self._args = dict()
         for k, v in kwargs.items():
-            self._args[k] = v
+            self._args[k] = _to_text(v)
+
+    @property
+    def args(self):
+        """
+        回复的字段值 dict, 不应修改
+        """
+        return self._args
 
     def render(self):
         raise NotImplementedError()
 
+    def render_bytes(self):
+        """
+        使用预编译模板渲染为不含排版空白的 UTF-8 bytes, 可直接作为 HTTP Response 的 Body
+        """
+        return b''.join(self.get_compiled_template().render_parts(self._args))
+
+    def get_compiled_template(self):
+        """
+        获取当前回复使用的预编译模板
+        """
+        raise NotImplementedError()
+
+    def render_chunks(self):
+        """
+        将回复渲染为 bytes 片段列表, 片段依次写出即为完整的响应体, 可直接作为 WSGI 应用的返回值,
+        由服务器逐段写出而不必先拼接. 模板中的固定片段在编译时已编码, 每次渲染只编码各个字段的值
+        """
+        return self.get_compiled_template().render_parts(self._args)
+
+    def get_cache_key(self):
+        """
+        获取回复消息体的缓存键, 缓存键相同的回复除接收方、发送方及创建时间外内容完全一致.
+        返回 None 表示不缓存: 消息体只有少数几个字段时, 直接渲染比查找缓存及单独渲染消息头更快, 因此默认返回 None
+        """
+        return None
+
+    def render_header(self):
+        """
+        渲染消息头 (接收方、发送方及创建时间), 返回 UTF-8 bytes
+        """
+        return self.get_compiled_template().sections[0].render(self._args)
+
+    def render_body(self):
+        """
+        渲染消息头之后的消息体, 返回 UTF-8 bytes
+        """
+        return self.get_compiled_template().sections[1].render(self._args)
+
 
 class TextReply(WechatReply):
     """
@@ -35,6 +267,7 @@ class TextReply(WechatReply):
     <Content><![CDATA[{content}]]></Content>
     </xml>
     """
+    COMPILED_TEMPLATE = CompiledTemplate(TEMPLATE)
 
     def __init__(self, message, content):
         """
@@ -46,6 +279,9 @@ class TextReply(WechatReply):
     def render(self):
         return TextReply.TEMPLATE.format(**self._args)
 
+    def get_compiled_template(self):
+        return TextReply.COMPILED_TEMPLATE
+
 
 class ImageReply(WechatReply):
     """
@@ -62,6 +298,7 @@ class ImageReply(WechatReply):
     </Image>
     </xml>
     """
+    COMPILED_TEMPLATE = CompiledTemplate(TEMPLATE)
 
     def __init__(self, message, media_id):
         """
@@ -73,6 +310,9 @@ class ImageReply(WechatReply):
     def render(self):
         return ImageReply.TEMPLATE.format(**self._args)
 
+    def get_compiled_template(self):
+        return ImageReply.COMPILED_TEMPLATE
+
 
 class VoiceReply(WechatReply):
     """
@@ -89,6 +329,7 @@ class VoiceReply(WechatReply):
     </Voice>
     </xml>
     """
+    COMPILED_TEMPLATE = CompiledTemplate(TEMPLATE)
 
     def __init__(self, message, media_id):
         """
@@ -100,6 +341,9 @@ class VoiceReply(WechatReply):
     def render(self):
         return VoiceReply.TEMPLATE.format(**self._args)
 
+    def get_compiled_template(self):
+        return VoiceReply.COMPILED_TEMPLATE
+
 
 class VideoReply(WechatReply):
     """
@@ -118,6 +362,7 @@ class VideoReply(WechatReply):
     </Video>
     </xml>
     """
+    COMPILED_TEMPLATE = CompiledTemplate(TEMPLATE)
 
     def __init__(self, message, media_id, title=None, description=None):
         """
@@ -133,6 +378,9 @@ class VideoReply(WechatReply):
     def render(self):
         return VideoReply.TEMPLATE.format(**self._args)
 
+    def get_compiled_template(self):
+        return VideoReply.COMPILED_TEMPLATE
+
 
 class MusicReply(WechatReply):
     """
@@ -153,6 +401,7 @@ class MusicReply(WechatReply):
     </Music>
     </xml>
     """
+    COMPILED_TEMPLATE_THUMB = CompiledTemplate(TEMPLATE_THUMB)
 
     TEMPLATE_NOTHUMB = u"""
     <xml>
@@ -168,6 +417,7 @@ class MusicReply(WechatReply):
     </Music>
     </xml>
     """
+    COMPILED_TEMPLATE_NOTHUMB = CompiledTemplate(TEMPLATE_NOTHUMB)
 
     def __init__(self, message, title='', description='', music_url='', hq_music_url='', thumb_media_id=None):
         title = title or ''
@@ -183,13 +433,19 @@ class MusicReply(WechatReply):
         else:
             return MusicReply.TEMPLATE_NOTHUMB.format(**self._args)
 
+    def get_compiled_template(self):
+        if self._args['thumb_media_id']:
+            return MusicReply.COMPILED_TEMPLATE_THUMB
+        else:
+            return MusicReply.COMPILED_TEMPLATE_NOTHUMB
+
 
 class Article(object):
     def __init__(self, title=None, description=None, picurl=None, url=None):
-        self.title = title or ''
-        self.description = description or ''
-        self.picurl = picurl or ''
-        self.url = url or ''
+        self.title = _to_text(title or '')
+        self.description = _to_text(description or '')
+        self.picurl = _to_text(picurl or '')
+        self.url = _to_text(url or '')
 
 
 class ArticleReply(WechatReply):
@@ -203,6 +459,7 @@ class ArticleReply(WechatReply):
     <Articles>{items}</Articles>
     </xml>
     """
+    COMPILED_TEMPLATE = CompiledTemplate(TEMPLATE)
 
     ITEM_TEMPLATE = u"""
     <item>
@@ -212,6 +469,7 @@ class ArticleReply(WechatReply):
     <Url><![CDATA[{url}]]></Url>
     </item>
     """
+    COMPILED_ITEM_TEMPLATE = CompiledTemplate(ITEM_TEMPLATE)
 
     def __init__(self, message, **kwargs):
         super(ArticleReply, self).__init__(message, **kwargs)
@@ -234,4 +492,37 @@ class ArticleReply(WechatReply):
             ))
         self._args["items"] = ''.join(items)
         self._args["count"] = len(items)
-        return ArticleReply.TEMPLATE.format(**self._args)
\ No newline at end of file
+        return ArticleReply.TEMPLATE.format(**self._args)
+
+    def render_bytes(self):
+        return b''.join(self.render_chunks())
+
+    def get_compiled_template(self):
+        return ArticleReply.COMPILED_TEMPLATE
+
+    def render_chunks(self):
+        args = dict(self._args, items=self._render_items(), count=len(self._articles))
+        return ArticleReply.COMPILED_TEMPLATE.render_parts(args)
+
+    def get_cache_key(self):
+        return ArticleReply.COMPILED_TEMPLATE, tuple([(article.title, article.description, article.picurl, article.url)
+                                                      for article in self._articles])
+
+    def render_body(self):
+        args = dict(self._args, items=self._render_items(), count=len(self._articles))
+        return ArticleReply.COMPILED_TEMPLATE.sections[1].render(args)
+
+    def _render_items(self):
+        """
+        将各条图文渲染为 bytes 片段列表
+        """
+        chunks = []
+        render_parts = ArticleReply.COMPILED_ITEM_TEMPLATE.render_parts
+        for article in self._articles:
+            render_parts({
+                'title': article.title,
+                'description': article.description,
+                'picurl': article.picurl,
+                'url': article.url,
+            }, chunks)
+        return chunks
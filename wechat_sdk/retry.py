@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+import contextlib
+import random
+import threading
+
+import requests
+
+try:
+    import contextvars
+except ImportError:  # Python 3.7 以下使用线程局部变量
+    contextvars = None
+
+
+# access_token 无效或过期的错误码, 重新获取 access_token 后重试
+TOKEN_ERRCODES = (40001, 40014, 42001)
+
+# 可以重试的错误码: 系统繁忙
+RETRY_ERRCODES = (-1,)
+
+# 可以重试的 HTTP 状态码
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# 幂等的请求方法, 超时及 HTTP 错误时可以安全地重放
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+ERROR_TOKEN = 'token'
+ERROR_RETRY = 'retry'
+ERROR_FATAL = 'fatal'
+
+
+class RetryPolicy(object):
+    """
+    官方 API 请求的重试策略
+
+    access_token 失效 (40001/40014/42001) 时重新获取 access_token 并重放请求, 只进行一次;
+    系统繁忙 (-1)、网络错误及 5xx/429 HTTP 错误按指数退避加随机抖动重试, 最多重试 max_retries 次; 其他错误直接抛出.
+    POST 等非幂等请求默认只在连接失败 (请求没有发出) 时重试: 超时或网关返回 5xx 时微信可能已经处理了请求 (如已发出客服消息),
+    重放会导致重复执行
+    """
+    def __init__(self, max_retries=2, backoff=0.2, max_backoff=5.0, jitter=0.5, refresh_token=True, retry_http=True,
+                 token_errcodes=TOKEN_ERRCODES, retry_errcodes=RETRY_ERRCODES, retry_status_codes=RETRY_STATUS_CODES,
+                 retry_unsafe=False):
+        """
+        :param max_retries: 系统繁忙及 HTTP 错误的最大重试次数, 为 0 时不重试
+        :param backoff: 第一次重试前的等待时间 (秒), 之后每次翻倍
+        :param max_backoff: 单次等待时间上限 (秒)
+        :param jitter: 随机抖动比例, 实际等待时间在 [等待时间 * (1 - jitter), 等待时间] 之间
+        :param refresh_token: access_token 失效时是否重新获取并重放请求
+        :param retry_http: 是否重试网络错误及 retry_status_codes 中的 HTTP 错误
+        :param token_errcodes: 表示 access_token 失效的错误码
+        :param retry_errcodes: 可以重试的错误码
+        :param retry_status_codes: 可以重试的 HTTP 状态码
+        :param retry_unsafe: POST 等非幂等请求超时或返回 retry_status_codes 中的 HTTP 错误时是否同样重试, 默认只重试连接失败
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.refresh_token = refresh_token
+        self.retry_http = retry_http
+        self.token_errcodes = tuple(token_errcodes)
+        self.retry_errcodes = tuple(retry_errcodes)
+        self.retry_status_codes = tuple(retry_status_codes)
+        self.retry_unsafe = retry_unsafe
+
+    def replace(self, **kwargs):
+        """
+        复制当前策略并修改指定的参数
+        :return: 新的 RetryPolicy 对象
+        """
+        options = dict(self.__dict__)
+        options.update(kwargs)
+        return RetryPolicy(**options)
+
+    def classify(self, errcode):
+        """
+        对错误码进行分类
+        :return: ERROR_TOKEN (access_token 失效), ERROR_RETRY (可重试) 或 ERROR_FATAL (不可重试)
+        """
+        if errcode in self.token_errcodes:
+            return ERROR_TOKEN
+        if errcode in self.retry_errcodes:
+            return ERROR_RETRY
+        return ERROR_FATAL
+
+    def is_retryable_http_error(self, error, method='GET'):
+        """
+        判断 HTTP 请求异常是否可以重试
+        :param error: requests.RequestException 异常
+        :param method: 请求方法
+        """
+        if not self.retry_http:
+            return False
+        if not self.retry_unsafe and method.upper() not in IDEMPOTENT_METHODS:
+            # 非幂等请求只重试连接失败, 此时请求没有发出
+            return isinstance(error, requests.ConnectionError)
+        if isinstance(error, requests.HTTPError):
+            response = getattr(error, 'response', None)
+            return response is not None and response.status_code in self.retry_status_codes
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+    def get_delay(self, attempt):
+        """
+        获取第 attempt 次重试 (从 0 开始) 前的等待时间 (秒)
+        """
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return delay * (1 - self.jitter * random.random())
+
+
+class _PolicyOverrides(object):
+    """
+    保存 retry_policy 上下文管理器设置的重试策略, 使用 contextvars (或线程局部变量) 保证只对当前协程 (线程) 生效
+    """
+    def __init__(self):
+        if contextvars is not None:
+            self._var = contextvars.ContextVar('wechat_sdk_retry_policy', default=())
+        else:
+            self._local = threading.local()
+
+    def get(self):
+        if contextvars is not None:
+            return self._var.get()
+        return getattr(self._local, 'value', ())
+
+    def set(self, value):
+        if contextvars is not None:
+            return self._var.set(value)
+        previous = self.get()
+        self._local.value = value
+        return previous
+
+    def reset(self, token):
+        if contextvars is not None:
+            self._var.reset(token)
+        else:
+            self._local.value = token
+
+
+_overrides = _PolicyOverrides()
+
+
+def get_override(owner):
+    """
+    获取当前上下文中为 owner 设置的重试策略
+    :return: RetryPolicy 对象, 未设置时返回 None
+    """
+    for key, policy in reversed(_overrides.get()):
+        if key is owner:
+            return policy
+    return None
+
+
+@contextlib.contextmanager
+def override(owner, policy):
+    """
+    在 with 块内为 owner 使用指定的重试策略, 只对当前协程 (线程) 生效
+    :param owner: WechatBasic 实例
+    :param policy: RetryPolicy 对象
+    """
+    token = _overrides.set(_overrides.get() + ((owner, policy),))
+    try:
+        yield policy
+    finally:
+        _overrides.reset(token)
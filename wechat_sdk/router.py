@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+
+class MessageRouter(object):
+    """
+    消息路由器
+
+    按 (消息类型, 事件类型, 事件 key 值, 文本内容) 注册处理函数, 分发时根据消息的属性组合出路由键,
+    按从具体到一般的顺序进行常数次哈希查找, 不需要逐个判断条件 ::
+
+        router = MessageRouter()
+
+        @router.register('text', content=u'帮助')
+        def help(message):
+            return wechat.reply_text(message, u'帮助信息')
+
+        @router.register('event', event='click', key='V1001_TODAY_MUSIC')
+        def today_music(message):
+            return wechat.reply_text(message, u'今日歌曲')
+
+        @router.register('text')
+        def other_text(message):
+            return wechat.reply_text(message, u'文字')
+
+        response = router.dispatch(wechat.parse_message(body))
+
+    文本消息依次查找 (text, 内容) 和 (text); 事件消息依次查找 (event, 事件类型, key), (event, 事件类型) 和 (event);
+    其他消息查找 (消息类型). 均未命中时调用默认处理函数
+    """
+    DEFAULT_ROUTE = ('default', None, None, None)
+
+    def __init__(self, default=None, dedup=None):
+        """
+        :param default: 默认处理函数, 没有匹配的路由时调用, 为 None 时 dispatch 返回 None
+        :param dedup: MessageDeduplicator 实例, 传入后分发前先对消息进行去重
+        """
+        self._routes = {}
+        self._default = default
+        self._dedup = dedup
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def add_route(self, handler, type, event=None, key=None, content=None):
+        """
+        注册路由, 同一路由重复注册时以最后一次为准
+        :param handler: 处理函数, 接受消息对象作为参数, 返回响应数据
+        :param type: 消息类型, 如 'text', 'image', 'event'
+        :param event: 事件类型, 如 'click', 'subscribe', 仅 type 为 'event' 时有效
+        :param key: 事件 key 值, 需同时指定 event
+        :param content: 完全匹配的文本内容, 仅 type 为 'text' 时有效
+        """
+        if key is not None and event is None:
+            raise ValueError('Parameter event is required when key is provided.')
+        if event is not None and type != 'event':
+            raise ValueError('Parameter event is only available for event messages.')
+        if content is not None and type != 'text':
+            raise ValueError('Parameter content is only available for text messages.')
+
+        if event is not None:
+            event = event.lower()
+        self._routes[(type, event, key, content)] = handler
+
+    def register(self, type, event=None, key=None, content=None):
+        """
+        以装饰器的方式注册路由, 参数同 :func:`add_route`
+        """
+        def decorator(handler):
+            self.add_route(handler, type, event=event, key=key, content=content)
+            return handler
+        return decorator
+
+    def default(self, handler):
+        """
+        以装饰器的方式设置默认处理函数
+        """
+        self._default = handler
+        return handler
+
+    def resolve(self, message):
+        """
+        查找消息对应的路由
+        :param message: 消息对象
+        :return: (路由键, 处理函数), 没有匹配的路由且没有默认处理函数时处理函数为 None
+        """
+        routes = self._routes
+        msg_type = getattr(type(message), 'msg_type', None) or message.type
+
+        if msg_type == 'event':
+            event = message.type
+            key = getattr(message, 'key', None)
+            if key is not None:
+                route = ('event', event, key, None)
+                if route in routes:
+                    return route, routes[route]
+            route = ('event', event, None, None)
+            if route in routes:
+                return route, routes[route]
+        elif msg_type == 'text':
+            route = ('text', None, None, message.content)
+            if route in routes:
+                return route, routes[route]
+
+        route = (msg_type, None, None, None)
+        if route in routes:
+            return route, routes[route]
+        return self.DEFAULT_ROUTE, self._default
+
+    def dispatch(self, message):
+        """
+        分发消息
+        :param message: 消息对象
+        :return: 处理函数的返回值, 没有匹配的路由且没有默认处理函数时返回 None
+        """
+        if self._dedup is not None:
+            return self._dedup.handle(message, self._dispatch)
+        return self._dispatch(message)
+
+    def stats(self):
+        """
+        各路由的命中次数及耗时统计
+        :return: dict 对象, key 为路由键 (type, event, key, content), 默认处理函数为 ('default', None, None, None);
+                 value 为 dict 对象, key 包括 `hits` (命中次数), `total_time` (总耗时, 秒), `avg_time` (平均耗时, 秒)
+        """
+        with self._lock:
+            return dict((route, {
+                'hits': hits,
+                'total_time': total_time,
+                'avg_time': total_time / hits,
+            }) for route, (hits, total_time) in self._stats.items())
+
+    def reset_stats(self):
+        """
+        清空路由统计
+        """
+        with self._lock:
+            self._stats.clear()
+
+    def _dispatch(self, message):
+        route, handler = self.resolve(message)
+        if handler is None:
+            return None
+
+        start = _timer()
+        try:
+            return handler(message)
+        finally:
+            elapsed = _timer() - start
+            with self._lock:
+                stat = self._stats.get(route)
+                if stat is None:
+                    self._stats[route] = [1, elapsed]
+                else:
+                    stat[0] += 1
+                    stat[1] += elapsed
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# 各微信服务器主机默认的连接池大小, 多媒体文件的上传下载耗时较长且并发较少, 单独使用较小的连接池
+DEFAULT_POOL_SIZES = {
+    'api.weixin.qq.com': 10,
+    'file.api.weixin.qq.com': 4,
+}
+
+# 未单独配置的主机使用的连接池大小
+DEFAULT_POOL_SIZE = 2
+
+
+def create_session(pool_sizes=None, default_pool_size=DEFAULT_POOL_SIZE):
+    """
+    创建访问微信服务器使用的 requests.Session, 各主机使用独立的 keep-alive 连接池
+    :param pool_sizes: 主机 -> 连接池大小的 dict, 与 DEFAULT_POOL_SIZES 合并
+    :param default_pool_size: 未单独配置的主机使用的连接池大小
+    :return: requests.Session 实例
+    """
+    sizes = dict(DEFAULT_POOL_SIZES)
+    sizes.update(pool_sizes or {})
+
+    session = requests.Session()
+    default_adapter = HTTPAdapter(pool_connections=len(sizes) + 1, pool_maxsize=default_pool_size)
+    session.mount('http://', default_adapter)
+    session.mount('https://', default_adapter)
+    for host, size in sizes.items():
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+        session.mount('http://{}/'.format(host), adapter)
+        session.mount('https://{}/'.format(host), adapter)
+    return session
+
+
+def get_pool_stats(session):
+    """
+    统计 session 中各连接池的使用情况
+    :param session: requests.Session 实例, 只统计其中 HTTPAdapter 的连接池
+    :return: dict, 包含请求数 (requests), 新建连接数 (connections), 连接复用率 (reuse_ratio),
+             空闲连接数 (idle_connections), 使用中的连接数 (active_connections) 及按主机统计的相同数据 (hosts)
+    """
+    hosts = {}
+    seen = set()
+    for adapter in session.adapters.values():
+        if not isinstance(adapter, HTTPAdapter) or id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats = hosts.setdefault(pool.host, _empty_stats())
+            _add_pool_stats(stats, pool)
+
+    total = _empty_stats()
+    for stats in hosts.values():
+        for name in ('requests', 'connections', 'idle_connections', 'active_connections'):
+            total[name] += stats[name]
+        _update_reuse_ratio(stats)
+    _update_reuse_ratio(total)
+    total['hosts'] = hosts
+    return total
+
+
+def _empty_stats():
+    return {
+        'requests': 0,
+        'connections': 0,
+        'reuse_ratio': 0.0,
+        'idle_connections': 0,
+        'active_connections': 0,
+    }
+
+
+def _add_pool_stats(stats, pool):
+    """
+    累加单个 urllib3 连接池的统计数据
+    """
+    stats['requests'] += pool.num_requests
+    stats['connections'] += pool.num_connections
+    queue = pool.pool
+    if queue is None:  # 连接池已关闭
+        return
+    idle = len([conn for conn in list(queue.queue) if conn is not None])
+    stats['idle_connections'] += idle
+    stats['active_connections'] += max(queue.maxsize - queue.qsize(), 0)
+
+
+def _update_reuse_ratio(stats):
+    if stats['requests']:
+        stats['reuse_ratio'] = max(1.0 - float(stats['connections']) / stats['requests'], 0.0)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import time
+
+import requests
+try:
+    from http.cookiejar import DefaultCookiePolicy
+except ImportError:
+    from cookielib import DefaultCookiePolicy
+from requests.cookies import RequestsCookieJar
+from requests.structures import CaseInsensitiveDict
+
+
+class Response(object):
+    """
+    非 requests 传输层返回的响应, 提供 WechatBasic 及 WechatExt 使用到的 requests.Response 接口
+    """
+    def __init__(self, status_code, content, headers=None, url=None):
+        """
+        :param status_code: HTTP 状态码
+        :param content: 响应体 bytes
+        :param headers: 响应头 dict
+        :param url: 请求地址
+        """
+        self.status_code = status_code
+        self.content = content
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.url = url
+        self.cookies = RequestsCookieJar()
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    @property
+    def raw(self):
+        return _RawBody(self.content)
+
+    def json(self):
+        return json.loads(self.text)
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def raise_for_status(self):
+        """
+        :raises HTTPError: HTTP 状态码表示请求失败
+        """
+        if 400 <= self.status_code < 600:
+            raise requests.HTTPError('{} Error for url: {}'.format(self.status_code, self.url), response=self)
+
+
+class _RawBody(io.BytesIO):
+    """
+    模拟 urllib3 响应对象, 提供 read() 及 data 属性
+    """
+    @property
+    def data(self):
+        return self.getvalue()
+
+
+class BaseTransport(object):
+    """
+    传输层基类, WechatBasic 及 WechatExt 的所有 HTTP 请求均通过传输层发送
+
+    子类需实现 request 方法, 参数与 requests.request 的同名参数一致, 返回 requests.Response 或 Response 对象
+    """
+    def request(self, method, url, params=None, data=None, files=None, headers=None, stream=False):
+        raise NotImplementedError()
+
+    def get(self, url, **kwargs):
+        return self.request('get', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('post', url, **kwargs)
+
+
+class RequestsTransport(BaseTransport):
+    """
+    使用 requests.Session 发送请求的传输层
+    """
+    def __init__(self, session=None, store_cookies=True):
+        """
+        :param session: requests.Session 实例, 不传入时新建
+        :param store_cookies: 新建 Session 时是否保存服务器返回的 Cookie 并在之后的请求中自动发送
+        """
+        if session is None:
+            session = requests.Session()
+            if not store_cookies:
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self.session = session
+
+    def request(self, method, url, params=None, data=None, files=None, headers=None, stream=False):
+        return self.session.request(method, url, params=params, data=data, files=files, headers=headers,
+                                    stream=stream)
+
+
+class MockTransport(BaseTransport):
+    """
+    将请求交给进程内的 MockWechatServer 处理的传输层, 不访问网络
+    """
+    def __init__(self, server):
+        """
+        :param server: wechat_sdk.mock.MockWechatServer 实例
+        """
+        self.server = server
+
+    def request(self, method, url, params=None, data=None, files=None, headers=None, stream=False):
+        latency = self.server.get_latency()
+        if latency > 0:
+            time.sleep(latency)
+        return self.server.handle(method, url, params=params, data=data, files=files, headers=headers)